@@ -0,0 +1,140 @@
+"""
+Request Coalescing and Admission Control
+1. SingleFlight         - concurrent identical requests share one in-flight
+                          computation instead of each starting their own
+2. ConcurrencyLimiter   - at most `limit` computations run at once, up to
+                          `max_queue` more wait for a slot, and anything beyond
+                          that is rejected with 429 and Retry-After
+3. run_exclusive        - the same coalescing across processes, through a lock
+                          file: a run started by another uvicorn worker is
+                          waited for instead of started again
+
+SingleFlight and ConcurrencyLimiter run on the server's event loop and are per
+process (each uvicorn worker has its own); blocking work is handed to the
+thread pool by the caller. run_exclusive blocks, so it runs in the thread pool.
+"""
+
+import os
+import json
+import fcntl
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+class Overloaded(HTTPException):
+    """Rejected by admission control; rendered by FastAPI as 429 with Retry-After"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(
+            status_code=429,
+            detail=f"Too many concurrent {name} requests, retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._calls = {}
+
+    def in_flight(self, key):
+        return key in self._calls
+
+    async def run(self, key, coroutine_function):
+        """
+        Await coroutine_function() - or the call already running for key.
+        Returns (result, shared) where shared is True if another request started it.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(coroutine_function())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._calls.pop(key, None) if self._calls.get(key) is done else None)
+        # A disconnecting client cancels only its own wait, never the shared call
+        return await asyncio.shield(task), shared
+
+class ConcurrencyLimiter:
+    """Bounded concurrency with a bounded, optionally time-limited wait queue"""
+
+    def __init__(self, name, limit, max_queue, queue_timeout=None, retry_after=1):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the limiter's slots, waiting in the queue if needed"""
+        # Counted here rather than via the semaphore: a burst arrives before
+        # any of its requests has actually acquired a slot
+        if self.active + self.waiting >= self.limit + self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after)
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+def run_exclusive(lock_path, function):
+    """
+    Run function() while holding an exclusive lock file shared by every process.
+    If another process holds the lock, wait for its run to finish and return
+    that run's result instead of running again. The result must be JSON-serializable.
+    Returns (result, shared) where shared is True if another process ran it.
+    """
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    result_path = f"{lock_path}.result.json"
+    with open(lock_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Another process is running it: wait for it to finish
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(result_path) as f:
+                    return json.load(f), True
+            except FileNotFoundError:
+                raise RuntimeError(f"The run in another process failed ({os.path.basename(lock_path)})")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        try:
+            # Only a successful run leaves a result for the processes waiting on it
+            if os.path.exists(result_path):
+                os.remove(result_path)
+            result = function()
+            tmp_path = f"{result_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, result_path)
+            return result, False
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,366 @@
+"""
+Benchmarks for the Premier League MVP Predictor
+
+Usage:
+    python benchmark.py startup [--port 8010]
+    python benchmark.py pipeline [--reads 200]
+    python benchmark.py search [--repeat 1000]
+    python benchmark.py validation [--scale 100]
+    python benchmark.py retention [--runs 365]
+    python benchmark.py responses [--repeat 300]
+    python benchmark.py intervals [--max-overhead 2.0]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+import urllib.error
+
+def _time_request(url, timeout=2):
+    """Return the HTTP status for url, or None if the server is not listening"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+def benchmark_startup(args):
+    """Measure module import time and time-to-first-request for the API server"""
+    # Import time in a fresh interpreter (no warm module cache)
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import premierleague_MLModel"], check=True)
+    import_seconds = time.perf_counter() - start_time
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    start_time = time.perf_counter()
+    server_process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "premierleague_MLModel:app",
+         "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"]
+    )
+
+    results = {"import_seconds": round(import_seconds, 3)}
+    try:
+        # Poll each milestone in order: process serving, model ready, first API response
+        for name, path, expected in [
+            ("healthz_seconds", "/healthz", 200),
+            ("ready_seconds", "/readyz", 200),
+            ("first_request_seconds", "/api/top_players", 200),
+        ]:
+            while _time_request(f"{base_url}{path}") != expected:
+                if server_process.poll() is not None:
+                    raise RuntimeError("Server exited during startup")
+                if time.perf_counter() - start_time > args.timeout:
+                    raise TimeoutError(f"{path} did not return {expected} within {args.timeout} seconds")
+                time.sleep(0.05)
+            results[name] = round(time.perf_counter() - start_time, 3)
+
+        with urllib.request.urlopen(f"{base_url}/readyz") as response:
+            results["server_state"] = json.loads(response.read())
+    finally:
+        server_process.terminate()
+        server_process.wait()
+
+    print(json.dumps(results, indent=2))
+    return results
+
+def benchmark_pipeline(args):
+    """Run the ETL and prediction pipeline offline, writing only to a scratch directory"""
+    import tempfile
+
+    scratch_dir = tempfile.mkdtemp(prefix="fpl-bench-")
+    # Must be set before storage is imported: it reads them at import time
+    os.environ["FPL_OFFLINE"] = "1"
+    # Empty rather than unset so load_dotenv() does not fill it in from .env
+    os.environ["DATABASE_URL"] = ""
+    os.environ["SQLITE_DATABASE_PATH"] = os.path.join(scratch_dir, "fpl_local.db")
+    # Keep checkpoints away from the real ones in ./data
+    os.environ["ETL_RUNS_DIR"] = os.path.join(scratch_dir, "etl_runs")
+
+    from etl_pipeline import ETLPipeline
+    from generate_predictions import main as run_predictions_main
+    from storage import get_storage
+
+    results = {}
+    start_time = time.perf_counter()
+    ETLPipeline().run()
+    results["etl_seconds"] = round(time.perf_counter() - start_time, 3)
+
+    start_time = time.perf_counter()
+    run_predictions_main()
+    results["predictions_seconds"] = round(time.perf_counter() - start_time, 3)
+
+    storage = get_storage()
+    start_time = time.perf_counter()
+    for _ in range(args.reads):
+        storage.latest_predictions(limit=25)
+    results["latest_read_ms"] = round((time.perf_counter() - start_time) * 1000 / args.reads, 3)
+
+    print(json.dumps(results, indent=2))
+    return results
+
+def benchmark_search(args):
+    """Index build time and per-query latency of the player search index"""
+    import pandas as pd
+    from search import PlayerSearchIndex
+
+    df = pd.read_csv('./data/players.csv').fillna('')
+    players = {
+        int(row.id): {'name': row.name, 'web_name': row.web_name, 'team': row.team}
+        for row in df.itertuples()
+    }
+
+    index = PlayerSearchIndex()
+    start_time = time.perf_counter()
+    index.update(players)
+    results = {"players": len(index), "build_ms": round((time.perf_counter() - start_time) * 1000, 3)}
+
+    # Prefix, accent-folded, multi-word and misspelled queries
+    queries = ['sal', 'fabio vieira', 'odegaard', 'man city haal', 'salha', 'b fernandes', 'a']
+    for query in queries:
+        start_time = time.perf_counter()
+        for _ in range(args.repeat):
+            index.search(query, limit=10)
+        results[f"query_ms[{query}]"] = round((time.perf_counter() - start_time) * 1000 / args.repeat, 4)
+
+    print(json.dumps(results, indent=2))
+    return results
+
+def benchmark_validation(args):
+    """ETL validation time on the real players and on the same rows repeated --scale times"""
+    import numpy as np
+    import pandas as pd
+    from etl_pipeline import ETLPipeline
+    from validation import validate
+
+    raw = pd.read_csv('./data/players.csv')
+    # transform() needs no connections, so skip ETLPipeline.__init__
+    df = ETLPipeline.__new__(ETLPipeline).transform(raw)
+
+    results = {}
+    for scale in (1, args.scale):
+        frame = pd.concat([df] * scale, ignore_index=True)
+        frame['player_id'] = np.arange(1, len(frame) + 1)
+        timings = []
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            _, quarantined, _ = validate(frame)
+            timings.append(time.perf_counter() - start_time)
+        results[f"rows[{len(frame)}]"] = {
+            "validate_ms": round(min(timings) * 1000, 3),
+            "quarantined": len(quarantined),
+        }
+
+    print(json.dumps(results, indent=2))
+    return results
+
+# The latest-prediction query before prediction batches were read by date,
+# kept for comparison: it groups the whole history by player on every read
+LEGACY_LATEST_QUERY = """
+    WITH latest_predictions AS (
+        SELECT player_id, MAX(prediction_date) as latest_date
+        FROM predictions
+        GROUP BY player_id
+    )
+    SELECT p.player_id, p.name, p.team, p.position, p.value_season,
+           pred.predicted_value, pred.model_version, pred.prediction_date
+    FROM predictions pred
+    JOIN players p ON pred.player_id = p.player_id
+    JOIN latest_predictions lp ON pred.player_id = lp.player_id
+        AND pred.prediction_date = lp.latest_date
+    ORDER BY pred.predicted_value DESC
+    LIMIT 25
+"""
+
+def benchmark_retention(args):
+    """Latest-prediction read latency as daily batches accumulate, before and after maintenance"""
+    import tempfile
+    from datetime import datetime, timedelta
+    import numpy as np
+    import pandas as pd
+    from storage import SQLiteStorage
+    from maintenance import run_maintenance
+
+    storage = SQLiteStorage(os.path.join(tempfile.mkdtemp(prefix="fpl-bench-"), "fpl_local.db"))
+    players = pd.read_csv('./data/players.csv').rename(columns={'id': 'player_id'})
+    storage.upsert_players(players)
+
+    def time_reads(query=None):
+        start_time = time.perf_counter()
+        for _ in range(args.reads):
+            if query:
+                storage._read(query)
+            else:
+                storage.latest_predictions(limit=25)
+        return round((time.perf_counter() - start_time) * 1000 / args.reads, 3)
+
+    rng = np.random.default_rng(0)
+    first_run = datetime(2025, 8, 1)
+    checkpoints = {1, 10, 30, 100, args.runs}
+    results = {}
+    for run in range(1, args.runs + 1):
+        batch = pd.DataFrame({
+            'player_id': players['player_id'],
+            'predicted_value': np.round(rng.gamma(2.0, 2.0, len(players)), 2),
+        })
+        storage.store_predictions(batch, "v1.0", first_run + timedelta(days=run - 1))
+        if run in checkpoints:
+            results[f"runs[{run}]"] = {
+                "prediction_rows": run * len(players),
+                "latest_read_ms": time_reads(),
+                "legacy_latest_read_ms": time_reads(LEGACY_LATEST_QUERY),
+            }
+
+    report = run_maintenance(storage, now=first_run + timedelta(days=args.runs - 1))
+    remaining = int(storage._read("SELECT COUNT(*) AS n FROM predictions")['n'].iloc[0])
+    results["after_maintenance"] = {
+        "prediction_rows": remaining,
+        "batches_compacted": report["batches_compacted"],
+        "latest_read_ms": time_reads(),
+    }
+
+    print(json.dumps(results, indent=2))
+    return results
+
+def benchmark_responses(args):
+    """Bytes on the wire and CPU time per request for the read endpoints, by Accept-Encoding"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+    import premierleague_MLModel as api
+    from responses import dumps
+
+    paths = {
+        "top_players": "/api/top_players",
+        "search": "/api/players/search?q=sal",
+        "explain": "/api/players/1/explain",
+        "similar": "/api/players/1/similar?k=10",
+        "feature_importance": "/api/feature-importance",
+        "summary": "/api/export/summary",
+        "latest": "/api/predictions/latest?limit=25",
+    }
+
+    def cpu_ms(fn):
+        start_time = time.process_time()
+        for _ in range(args.repeat):
+            fn()
+        return round((time.process_time() - start_time) * 1000 / args.repeat, 4)
+
+    results = {}
+    with TestClient(api.app) as client:
+        while client.get("/readyz").status_code != 200:
+            time.sleep(0.05)
+
+        for name, path in paths.items():
+            result = {}
+            for encoding in ["identity", "gzip", "br"]:
+                headers = {"Accept-Encoding": encoding}
+                response = client.get(path, headers=headers)
+                result[encoding] = {
+                    "bytes": response.num_bytes_downloaded,
+                    # Includes the test client's own overhead, the same for every encoding
+                    "request_cpu_ms": cpu_ms(lambda: client.get(path, headers=headers)),
+                }
+
+            # Encoding cost alone: FastAPI's default path vs orjson (paid once per version when cached)
+            payload = response.json()
+            result["jsonable_encoder_cpu_ms"] = cpu_ms(lambda: JSONResponse(jsonable_encoder(payload)))
+            result["orjson_cpu_ms"] = cpu_ms(lambda: dumps(payload))
+            results[name] = result
+
+    print(json.dumps(results, indent=2))
+    return results
+
+def benchmark_intervals(args):
+    """Extra training and inference cost of prediction intervals, and their holdout coverage"""
+    import numpy as np
+    import pandas as pd
+    from generate_predictions import train_model, train_interval_model, generate_predictions
+    from intervals import INTERVAL_QUANTILES
+
+    df = pd.read_csv('./data/players.csv').rename(columns={'id': 'player_id'})
+    holdout = df.sample(frac=0.3, random_state=42)
+    train = df.drop(holdout.index)
+
+    def best_ms(fn):
+        timings = []
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start_time)
+        return result, round(min(timings) * 1000, 3)
+
+    (model, scaler, features), point_train_ms = best_ms(lambda: train_model(train))
+    interval_model, interval_train_ms = best_ms(lambda: train_interval_model(train, scaler, features))
+    _, point_predict_ms = best_ms(lambda: generate_predictions(model, scaler, features, holdout))
+    scored, interval_predict_ms = best_ms(
+        lambda: generate_predictions(model, scaler, features, holdout, interval_model)
+    )
+
+    scored = scored.merge(holdout[['player_id', 'value_season']], on='player_id').dropna(subset=['value_season'])
+    covered = scored['value_season'].between(scored['prediction_lower'], scored['prediction_upper'])
+    results = {
+        "train_ms": {"point": point_train_ms, "intervals": interval_train_ms},
+        # generate_predictions with intervals includes the point prediction
+        "predict_ms": {"point": point_predict_ms, "with_intervals": interval_predict_ms},
+        "train_overhead": round(interval_train_ms / point_train_ms, 3),
+        "nominal_coverage": round(INTERVAL_QUANTILES[-1] - INTERVAL_QUANTILES[0], 2),
+        "holdout_coverage": round(float(covered.mean()), 3),
+        "median_confidence": float(np.median(scored['confidence_score'])),
+    }
+
+    print(json.dumps(results, indent=2))
+    if results["train_overhead"] > args.max_overhead:
+        print(f"❌ Interval training costs {results['train_overhead']}x the point model (budget {args.max_overhead}x)")
+        sys.exit(1)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Premier League MVP Predictor benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup_parser = subparsers.add_parser("startup", help="Import time and time-to-first-request")
+    startup_parser.add_argument("--port", type=int, default=8010)
+    startup_parser.add_argument("--timeout", type=float, default=600)
+    startup_parser.set_defaults(func=benchmark_startup)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Offline ETL + predictions on SQLite")
+    pipeline_parser.add_argument("--reads", type=int, default=200)
+    pipeline_parser.set_defaults(func=benchmark_pipeline)
+
+    search_parser = subparsers.add_parser("search", help="Player search index latency")
+    search_parser.add_argument("--repeat", type=int, default=1000)
+    search_parser.set_defaults(func=benchmark_search)
+
+    validation_parser = subparsers.add_parser("validation", help="ETL data-quality validation time")
+    validation_parser.add_argument("--scale", type=int, default=100)
+    validation_parser.add_argument("--repeat", type=int, default=5)
+    validation_parser.set_defaults(func=benchmark_validation)
+
+    retention_parser = subparsers.add_parser("retention", help="Latest-read latency as history grows")
+    retention_parser.add_argument("--runs", type=int, default=365)
+    retention_parser.add_argument("--reads", type=int, default=50)
+    retention_parser.set_defaults(func=benchmark_retention)
+
+    responses_parser = subparsers.add_parser("responses", help="Response bytes and CPU time per request")
+    responses_parser.add_argument("--repeat", type=int, default=300)
+    responses_parser.set_defaults(func=benchmark_responses)
+
+    intervals_parser = subparsers.add_parser("intervals", help="Prediction interval cost and coverage")
+    intervals_parser.add_argument("--repeat", type=int, default=5)
+    intervals_parser.add_argument("--max-overhead", type=float, default=2.0,
+                                  help="Fail if interval training takes more than this multiple of the point model")
+    intervals_parser.set_defaults(func=benchmark_intervals)
+
+    args = parser.parse_args()
+    # Benchmarks resolve ./data relative to this directory, like the app does
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -40,8 +40,11 @@ CREATE TABLE IF NOT EXISTS players (
 );
 
 -- Player history table (for tracking changes over time)
+-- Partitioned by month of snapshot_date; maintenance.py creates the monthly
+-- partitions and drops those past the retention. Rows outside every monthly
+-- partition land in the default partition.
 CREATE TABLE IF NOT EXISTS player_history (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     player_id INTEGER,
     name VARCHAR(255),
     team VARCHAR(100),
@@ -51,20 +54,62 @@ CREATE TABLE IF NOT EXISTS player_history (
     goals_scored INTEGER,
     assists INTEGER,
     minutes INTEGER,
-    snapshot_date DATE DEFAULT CURRENT_DATE,
+    snapshot_date DATE NOT NULL DEFAULT CURRENT_DATE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, snapshot_date),
     FOREIGN KEY (player_id) REFERENCES players(player_id) ON DELETE CASCADE
-);
+) PARTITION BY RANGE (snapshot_date);
 
 -- Predictions table (stores model predictions)
+-- Every run appends a full batch sharing one prediction_date. Partitioned by
+-- month of prediction_date, like player_history.
 CREATE TABLE IF NOT EXISTS predictions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     player_id INTEGER,
     predicted_value DECIMAL(10, 2),
     model_version VARCHAR(50),
-    prediction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    confidence_score DECIMAL(5, 2),
+    prediction_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    confidence_score DECIMAL(5, 2), -- 0-1, from the width of the prediction interval
+    prediction_lower DECIMAL(10, 2), -- 10th percentile (multi-quantile model)
+    prediction_upper DECIMAL(10, 2), -- 90th percentile
+    PRIMARY KEY (id, prediction_date),
     FOREIGN KEY (player_id) REFERENCES players(player_id) ON DELETE CASCADE
+) PARTITION BY RANGE (prediction_date);
+
+-- Default partitions. Databases created before partitioning keep their plain
+-- tables (maintenance.py then falls back to range deletes), so only add them
+-- when the table is partitioned.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'player_history'::regclass) THEN
+        CREATE TABLE IF NOT EXISTS player_history_default PARTITION OF player_history DEFAULT;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'predictions'::regclass) THEN
+        CREATE TABLE IF NOT EXISTS predictions_default PARTITION OF predictions DEFAULT;
+    END IF;
+END $$;
+
+-- Per-run summaries of prediction batches compacted away by maintenance.py
+CREATE TABLE IF NOT EXISTS prediction_summaries (
+    id SERIAL PRIMARY KEY,
+    model_version VARCHAR(50),
+    prediction_date TIMESTAMP,
+    players INTEGER,
+    avg_predicted_value DECIMAL(10, 4),
+    min_predicted_value DECIMAL(10, 2),
+    max_predicted_value DECIMAL(10, 2),
+    compacted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (model_version, prediction_date)
+);
+
+-- Feature importance table (global SHAP importance per model version)
+CREATE TABLE IF NOT EXISTS feature_importance (
+    id SERIAL PRIMARY KEY,
+    model_version VARCHAR(50),
+    feature_name VARCHAR(100),
+    importance_score DECIMAL(10, 4),
+    mean_contribution DECIMAL(10, 4),
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Data updates tracking table (for ETL monitoring)
@@ -77,9 +122,27 @@ CREATE TABLE IF NOT EXISTS data_updates (
     error_message TEXT,
     started_at TIMESTAMP,
     completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    duration_seconds INTEGER
+    duration_seconds INTEGER,
+    run_id VARCHAR(50), -- ETL run (checkpoint directory) this update belongs to
+    stages TEXT -- JSON: which stages were 'reused' from a checkpoint vs 'recomputed'
 );
 
+-- Quarantine for rows that failed ETL validation (kept for inspection, never loaded)
+CREATE TABLE IF NOT EXISTS players_quarantine (
+    id SERIAL PRIMARY KEY,
+    run_id VARCHAR(50), -- ETL run that quarantined the row
+    player_id INTEGER, -- NULL when the id itself was missing or invalid
+    reasons TEXT, -- failed checks, separated by semicolons
+    row_data TEXT, -- JSON of the transformed row
+    quarantined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Columns added after the initial release (safe to re-run on existing databases)
+ALTER TABLE data_updates ADD COLUMN IF NOT EXISTS run_id VARCHAR(50);
+ALTER TABLE data_updates ADD COLUMN IF NOT EXISTS stages TEXT;
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS prediction_lower DECIMAL(10, 2);
+ALTER TABLE predictions ADD COLUMN IF NOT EXISTS prediction_upper DECIMAL(10, 2);
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_players_team ON players(team);
 CREATE INDEX IF NOT EXISTS idx_players_position ON players(position);
@@ -89,5 +152,8 @@ CREATE INDEX IF NOT EXISTS idx_player_history_player_id ON player_history(player
 CREATE INDEX IF NOT EXISTS idx_player_history_snapshot_date ON player_history(snapshot_date);
 CREATE INDEX IF NOT EXISTS idx_predictions_player_id ON predictions(player_id);
 CREATE INDEX IF NOT EXISTS idx_predictions_prediction_date ON predictions(prediction_date);
+CREATE INDEX IF NOT EXISTS idx_predictions_model_version_date ON predictions(model_version, prediction_date);
+CREATE INDEX IF NOT EXISTS idx_feature_importance_model_version ON feature_importance(model_version);
 CREATE INDEX IF NOT EXISTS idx_data_updates_completed_at ON data_updates(completed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_players_quarantine_run_id ON players_quarantine(run_id);
 
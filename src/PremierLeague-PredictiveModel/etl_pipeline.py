@@ -1,39 +1,196 @@
 """
 ETL Pipeline for Premier League MVP Predictor
 Extracts data from Kaggle, transforms it, and loads into:
-1. Neon PostgreSQL Database
+1. Neon PostgreSQL Database (or a local SQLite database when DATABASE_URL is not set)
 2. Google Sheets (for Looker Studio)
 
 This script can be run manually or scheduled (e.g., via Render cron jobs)
+Set FPL_OFFLINE=1 to skip the Kaggle download and use the existing ./data/players.csv
+
+Transformed rows pass through vectorized data-quality checks (validation.py);
+rows that fail are written to the players_quarantine table instead of being loaded.
+
+Each stage (extract, transform, validate, each sink) saves its output and a completion
+marker under data/etl_runs/<run_id>/. If a run fails, the next run resumes
+from the first incomplete stage instead of downloading and transforming again.
+A running pipeline holds a lock file in its run directory, so a run left
+'in_progress' with nobody holding the lock (the process was killed) is resumed too.
+A 'partial' run (only Google Sheets failed) is not resumed: the next run starts
+from a fresh extract, which retries the sink with new data.
 """
 
 import os
 import sys
+import fcntl
+import shutil
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
-import kaggle
-import psycopg2
 import gspread
 from google.oauth2.service_account import Credentials
 import json
 import time
 from typing import Dict, Optional
 from dotenv import load_dotenv
+from storage import get_storage
+from validation import validate
 
 # Load environment variables from .env file (for local development)
 load_dotenv()
 
+ETL_RUNS_DIR = os.getenv("ETL_RUNS_DIR", "./data/etl_runs")
+# Incomplete runs older than this start over with fresh data instead of resuming
+ETL_RESUME_MAX_AGE_HOURS = float(os.getenv("ETL_RESUME_MAX_AGE_HOURS", "6"))
+ETL_RUNS_TO_KEEP = 5
+
+# Pipeline stages, in order
+ETL_STAGES = ['extract', 'transform', 'validate', 'load_database', 'load_google_sheets']
+
+class RunCheckpoint:
+    """Stage outputs and completion markers for one ETL run, stored in a manifest"""
+    
+    def __init__(self, run_dir: str, manifest: Dict):
+        self.run_dir = run_dir
+        self.manifest = manifest
+        self._lock_file = None
+    
+    @property
+    def run_id(self) -> str:
+        return self.manifest['run_id']
+    
+    @classmethod
+    def create(cls, runs_dir: str = ETL_RUNS_DIR) -> 'RunCheckpoint':
+        run_id = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        run_dir = os.path.join(runs_dir, run_id)
+        os.makedirs(run_dir)
+        checkpoint = cls(run_dir, {
+            'run_id': run_id,
+            'status': 'in_progress',
+            'created_at': datetime.now().isoformat(),
+            'stages': {}
+        })
+        # Locked before the manifest exists, so no other process can resume it
+        checkpoint.acquire()
+        checkpoint.save()
+        return checkpoint
+    
+    @classmethod
+    def load(cls, run_dir: str) -> Optional['RunCheckpoint']:
+        try:
+            with open(os.path.join(run_dir, 'manifest.json')) as f:
+                return cls(run_dir, json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    @classmethod
+    def resume_or_create(cls, runs_dir: str = ETL_RUNS_DIR, run_id: Optional[str] = None,
+                         fresh: bool = False) -> 'RunCheckpoint':
+        """Resume the given run, or the latest failed recent run, or start a new one"""
+        os.makedirs(runs_dir, exist_ok=True)
+        
+        if run_id:
+            checkpoint = cls.load(os.path.join(runs_dir, run_id))
+            if checkpoint is None:
+                raise ValueError(f"ETL run {run_id} not found in {runs_dir}")
+            if not checkpoint.acquire():
+                raise RuntimeError(f"ETL run {run_id} is being run by another process")
+            return checkpoint
+        
+        if not fresh:
+            run_ids = sorted(name for name in os.listdir(runs_dir) if not name.startswith('.'))
+            if run_ids:
+                checkpoint = cls.load(os.path.join(runs_dir, run_ids[-1]))
+                # Partial runs already refreshed the database: resuming them would keep
+                # reusing their extract for as long as the failing sink keeps failing.
+                # An 'in_progress' run is resumable once nobody holds its lock (it was killed).
+                if checkpoint and checkpoint.manifest['status'] in ('failed', 'in_progress'):
+                    created_at = datetime.fromisoformat(checkpoint.manifest['created_at'])
+                    if (datetime.now() - created_at < timedelta(hours=ETL_RESUME_MAX_AGE_HOURS)
+                            and checkpoint.acquire()):
+                        return checkpoint
+        
+        checkpoint = cls.create(runs_dir)
+        checkpoint._remove_old_runs(runs_dir)
+        return checkpoint
+    
+    def _remove_old_runs(self, runs_dir: str):
+        run_ids = sorted(name for name in os.listdir(runs_dir) if not name.startswith('.'))
+        for run_id in run_ids[:-ETL_RUNS_TO_KEEP]:
+            old_run = RunCheckpoint(os.path.join(runs_dir, run_id), {})
+            # Never delete a run another process is still working on
+            if old_run.acquire():
+                shutil.rmtree(old_run.run_dir, ignore_errors=True)
+                old_run.release()
+    
+    def acquire(self) -> bool:
+        """
+        Lock the run for this process. Returns False if another process holds it.
+        The lock is released by release(), or by the OS if the process dies.
+        """
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.path('run.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+    
+    def release(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def path(self, filename: str) -> str:
+        return os.path.join(self.run_dir, filename)
+    
+    def is_complete(self, stage: str) -> bool:
+        return stage in self.manifest['stages']
+    
+    def stage(self, stage: str) -> Dict:
+        return self.manifest['stages'][stage]
+    
+    def mark_complete(self, stage: str, **details):
+        self.manifest['stages'][stage] = {
+            'completed_at': datetime.now().isoformat(),
+            **details
+        }
+        self.save()
+    
+    def set_status(self, status: str):
+        self.manifest['status'] = status
+        self.save()
+    
+    def save(self):
+        """Write the manifest atomically so a crash never leaves it half-written"""
+        tmp_path = self.path('manifest.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.path('manifest.json'))
+
 class ETLPipeline:
-    def __init__(self):
-        """Initialize ETL pipeline with database and Google Sheets connections"""
+    def __init__(self, run_id: Optional[str] = None, fresh: bool = False):
+        """
+        Initialize ETL pipeline with database and Google Sheets connections.
+        
+        run_id: resume a specific run (default: the latest failed recent run);
+                for a partial run this retries only its incomplete sinks
+        fresh: always start a new run
+        """
         self.start_time = time.time()
         self.rows_inserted = 0
         self.rows_updated = 0
+        self.rows_quarantined = 0
+        self.run_id = run_id
+        self.fresh = fresh
+        self.checkpoint = None
+        # Which stages were 'reused' from a checkpoint, 'recomputed', 'skipped' or 'failed' in this run
+        self.stage_results = {}
         
         # Initialize connections
-        self.db_conn = None
-        self.db_cursor = None
+        self.storage = None
         self.gc = None  # Google Sheets client
         
         # Setup connections
@@ -41,18 +198,10 @@ class ETLPipeline:
         self._setup_google_sheets()
     
     def _setup_database(self):
-        """Setup PostgreSQL connection to Neon database"""
+        """Setup database storage (Neon PostgreSQL, or local SQLite when offline)"""
         try:
-            # Get connection string from environment variable
-            database_url = os.getenv("DATABASE_URL")
-            
-            if not database_url:
-                raise ValueError("DATABASE_URL environment variable not set")
-            
-            # Connect to database
-            self.db_conn = psycopg2.connect(database_url)
-            self.db_cursor = self.db_conn.cursor()
-            print("✅ Connected to Neon PostgreSQL database")
+            self.storage = get_storage()
+            print(f"✅ Using {self.storage.name} database")
         except Exception as e:
             print(f"❌ Database connection error: {str(e)}")
             raise
@@ -98,8 +247,15 @@ class ETLPipeline:
     def extract(self) -> pd.DataFrame:
         """Extract data from Kaggle dataset"""
         try:
+            if os.getenv("FPL_OFFLINE"):
+                df = pd.read_csv('./data/players.csv')
+                print(f"✅ Offline mode: extracted {len(df)} rows from ./data/players.csv")
+                return df
+            
             print("📥 Extracting data from Kaggle...")
             
+            import kaggle
+            
             # Set Kaggle credentials from environment variables
             os.environ["KAGGLE_USERNAME"] = os.getenv("KAGGLE_USERNAME", "")
             os.environ["KAGGLE_KEY"] = os.getenv("KAGGLE_KEY", "")
@@ -169,8 +325,8 @@ class ETLPipeline:
                 if col in df.columns:
                     df[col] = df[col].fillna('').astype(str)
             
-            # Replace NaN with None for database insertion
-            df = df.replace({np.nan: None})
+            # NaN is converted to NULL by the storage layer at insert time, which keeps
+            # proper dtypes here so the transformed frame can be checkpointed
             
             print(f"✅ Transformed {len(df)} rows")
             return df
@@ -179,51 +335,48 @@ class ETLPipeline:
             print(f"❌ Transformation error: {str(e)}")
             raise
     
-    def load_to_database(self, df: pd.DataFrame):
-        """Load data into Neon PostgreSQL database"""
+    def validate(self, df: pd.DataFrame, raw: Optional[pd.DataFrame] = None):
+        """Run data-quality checks. Returns (valid rows, quarantined rows, report)."""
         try:
-            if not self.db_conn:
-                print("⚠️  Database connection not available. Skipping database load.")
-                return
+            print("🔎 Validating data...")
             
-            print("💾 Loading data to Neon PostgreSQL database...")
+            valid, quarantined, report = validate(df, raw)
             
-            # Get columns that exist in dataframe
-            columns = [col for col in df.columns if col != 'created_at']
-            
-            # Create upsert query (insert or update on conflict)
-            placeholders = ', '.join(['%s'] * len(columns))
-            columns_str = ', '.join(columns)
-            update_clause = ', '.join([f"{col} = EXCLUDED.{col}" for col in columns if col != 'player_id'])
-            
-            query = f"""
-                INSERT INTO players ({columns_str}, last_updated)
-                VALUES ({placeholders}, CURRENT_TIMESTAMP)
-                ON CONFLICT (player_id) 
-                DO UPDATE SET {update_clause}, last_updated = CURRENT_TIMESTAMP
-            """
-            
-            # Prepare data for insertion
-            values = [tuple(row) for row in df[columns].values]
+            if len(quarantined):
+                print(f"⚠️  Quarantined {len(quarantined)} rows: {report['failed_checks']}")
+            print(f"✅ Validated {len(df)} rows in {report['duration_ms']} ms ({len(valid)} passed)")
+            return valid, quarantined, report
+        
+        except Exception as e:
+            print(f"❌ Validation error: {str(e)}")
+            raise
+    
+    def load_to_database(self, df: pd.DataFrame, quarantined: Optional[pd.DataFrame] = None):
+        """Load data into the database (upsert in a single transaction) and record quarantined rows"""
+        try:
+            if not self.storage:
+                print("⚠️  Database connection not available. Skipping database load.")
+                return
             
-            # Execute batch insert using executemany (works better with ON CONFLICT)
-            self.db_cursor.executemany(query, values)
-            self.db_conn.commit()
+            print(f"💾 Loading data to {self.storage.name} database...")
             
-            self.rows_inserted = len(df)
+            self.rows_inserted = self.storage.upsert_players(df)
             print(f"✅ Loaded {self.rows_inserted} rows to database")
+            
+            if quarantined is not None and len(quarantined):
+                self.storage.quarantine_players(quarantined, self.checkpoint.run_id)
+                print(f"✅ Stored {len(quarantined)} quarantined rows for run {self.checkpoint.run_id}")
         
         except Exception as e:
-            self.db_conn.rollback()
             print(f"❌ Database load error: {str(e)}")
             raise
     
-    def load_to_google_sheets(self, df: pd.DataFrame):
-        """Load data into Google Sheets"""
+    def load_to_google_sheets(self, df: pd.DataFrame) -> bool:
+        """Load data into Google Sheets. Returns False if the load failed."""
         try:
             if not self.gc:
                 print("⚠️  Google Sheets client not available. Skipping Google Sheets update.")
-                return
+                return True
             
             print("📊 Loading data to Google Sheets...")
             
@@ -250,7 +403,7 @@ class ETLPipeline:
             sheets_columns = [col for col in sheets_columns if col in df.columns]
             
             # Convert dataframe to list of lists
-            data = df[sheets_columns].fillna('').values.tolist()
+            data = df[sheets_columns].astype(object).fillna('').values.tolist()
             headers = sheets_columns
             
             # Clear existing data and update
@@ -258,83 +411,177 @@ class ETLPipeline:
             worksheet.update([headers] + data, value_input_option='USER_ENTERED')
             
             print(f"✅ Loaded {len(data)} rows to Google Sheets")
+            return True
         
         except Exception as e:
             print(f"⚠️  Google Sheets load error: {str(e)}")
             # Don't raise - allow pipeline to continue even if Google Sheets fails
+            return False
     
     def log_update(self, status: str, error_message: Optional[str] = None):
         """Log ETL update to database"""
         try:
-            if not self.db_conn:
+            if not self.storage:
                 return
             
             duration = int(time.time() - self.start_time)
+            reused = 'reused' in self.stage_results.values()
             
-            query = """
-                INSERT INTO data_updates 
-                (update_type, rows_inserted, rows_updated, status, error_message, started_at, completed_at, duration_seconds)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            self.db_cursor.execute(query, (
-                'full_refresh',
+            self.storage.log_update(
+                'resumed' if reused else 'full_refresh',
                 self.rows_inserted,
                 self.rows_updated,
                 status,
                 error_message,
                 datetime.fromtimestamp(self.start_time),
                 datetime.now(),
-                duration
-            ))
-            self.db_conn.commit()
+                duration,
+                run_id=self.checkpoint.run_id if self.checkpoint else None,
+                stages=json.dumps(self.stage_results)
+            )
         
         except Exception as e:
             print(f"⚠️  Error logging update: {str(e)}")
     
+    def _run_extract(self) -> pd.DataFrame:
+        if self.checkpoint.is_complete('extract'):
+            self.stage_results['extract'] = 'reused'
+            df = pd.read_csv(self.checkpoint.path('players.csv'))
+            print(f"♻️  Reusing extracted data from run {self.checkpoint.run_id} ({len(df)} rows)")
+            return df
+        
+        df = self.extract()
+        # Keep the raw download with the run so a resume never re-downloads
+        shutil.copyfile('./data/players.csv', self.checkpoint.path('players.csv'))
+        self.checkpoint.mark_complete('extract', output='players.csv', rows=len(df))
+        self.stage_results['extract'] = 'recomputed'
+        return df
+    
+    def _run_transform(self, df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        if self.checkpoint.is_complete('transform'):
+            self.stage_results['transform'] = 'reused'
+            df = pd.read_parquet(self.checkpoint.path('transformed.parquet'))
+            print(f"♻️  Reusing transformed data from run {self.checkpoint.run_id} ({len(df)} rows)")
+            return df
+        
+        df = self.transform(df)
+        df.to_parquet(self.checkpoint.path('transformed.parquet'), index=False)
+        self.checkpoint.mark_complete('transform', output='transformed.parquet', rows=len(df))
+        self.stage_results['transform'] = 'recomputed'
+        return df
+    
+    def _run_validate(self, df: pd.DataFrame, raw: Optional[pd.DataFrame]):
+        if self.checkpoint.is_complete('validate'):
+            self.stage_results['validate'] = 'reused'
+            valid = pd.read_parquet(self.checkpoint.path('validated.parquet'))
+            quarantined = pd.read_parquet(self.checkpoint.path('quarantined.parquet'))
+            print(f"♻️  Reusing validated data from run {self.checkpoint.run_id} "
+                  f"({len(valid)} rows, {len(quarantined)} quarantined)")
+            return valid, quarantined
+        
+        if raw is None and self.checkpoint.is_complete('extract'):
+            raw = pd.read_csv(self.checkpoint.path('players.csv'))
+        valid, quarantined, report = self.validate(df, raw)
+        valid.to_parquet(self.checkpoint.path('validated.parquet'), index=False)
+        quarantined.to_parquet(self.checkpoint.path('quarantined.parquet'), index=False)
+        self.checkpoint.mark_complete(
+            'validate', output='validated.parquet', rows=len(valid),
+            quarantined=len(quarantined), failed_checks=report['failed_checks']
+        )
+        self.stage_results['validate'] = 'recomputed'
+        return valid, quarantined
+    
     def run(self):
-        """Run the complete ETL pipeline"""
+        """Run the complete ETL pipeline, resuming from the first incomplete stage"""
         try:
             print("🚀 Starting ETL Pipeline...")
             print(f"⏰ Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # Extract
-            df = self.extract()
-            
-            # Transform
-            df = self.transform(df)
+            self.checkpoint = RunCheckpoint.resume_or_create(run_id=self.run_id, fresh=self.fresh)
+            completed = [stage for stage in ETL_STAGES if self.checkpoint.is_complete(stage)]
+            if completed:
+                print(f"♻️  Resuming run {self.checkpoint.run_id} (completed: {', '.join(completed)})")
+            else:
+                print(f"🆕 Starting run {self.checkpoint.run_id}")
+            
+            # Extract (skipped entirely when the transformed output is checkpointed)
+            raw = None
+            if not self.checkpoint.is_complete('transform'):
+                raw = self._run_extract()
+            elif self.checkpoint.is_complete('extract'):
+                self.stage_results['extract'] = 'reused'
+            
+            # Transform (skipped when validation output is checkpointed)
+            df = None
+            if not self.checkpoint.is_complete('validate'):
+                df = self._run_transform(raw)
+            elif self.checkpoint.is_complete('transform'):
+                self.stage_results['transform'] = 'reused'
+            
+            # Validate: only rows passing every check are loaded
+            df, quarantined = self._run_validate(df, raw)
+            self.rows_quarantined = len(quarantined)
             
             # Load to database
-            self.load_to_database(df)
+            if self.checkpoint.is_complete('load_database'):
+                self.stage_results['load_database'] = 'reused'
+                self.rows_inserted = self.checkpoint.stage('load_database')['rows']
+            else:
+                self.load_to_database(df, quarantined)
+                self.checkpoint.mark_complete('load_database', rows=self.rows_inserted)
+                self.stage_results['load_database'] = 'recomputed'
+            
+            # Load to Google Sheets (failures don't fail the run, but leave the stage to retry)
+            if self.checkpoint.is_complete('load_google_sheets'):
+                self.stage_results['load_google_sheets'] = 'reused'
+            elif not self.gc:
+                # Not configured: nothing is written, so no completion marker either
+                print("⚠️  Google Sheets client not available. Skipping Google Sheets update.")
+                self.stage_results['load_google_sheets'] = 'skipped'
+            elif self.load_to_google_sheets(df):
+                self.checkpoint.mark_complete('load_google_sheets', rows=len(df))
+                self.stage_results['load_google_sheets'] = 'recomputed'
+            else:
+                self.stage_results['load_google_sheets'] = 'failed'
             
-            # Load to Google Sheets
-            self.load_to_google_sheets(df)
+            incomplete = [
+                stage for stage in ETL_STAGES
+                if not self.checkpoint.is_complete(stage) and self.stage_results.get(stage) != 'skipped'
+            ]
+            status = 'partial' if incomplete else 'success'
+            self.checkpoint.set_status(status)
             
             # Log success
-            self.log_update('success')
+            self.log_update(status)
             
             duration = time.time() - self.start_time
-            print(f"\n✅ ETL Pipeline completed successfully!")
+            print(f"\n✅ ETL Pipeline completed {'successfully' if status == 'success' else 'with incomplete stages'}!")
             print(f"⏱️  Duration: {duration:.2f} seconds")
             print(f"📊 Rows processed: {self.rows_inserted}")
+            print(f"🚧 Rows quarantined: {self.rows_quarantined}")
+            print(f"♻️  Stages: {self.stage_results}")
         
         except Exception as e:
             error_msg = str(e)
             print(f"\n❌ ETL Pipeline failed: {error_msg}")
+            if self.checkpoint:
+                self.checkpoint.set_status('failed')
             self.log_update('failed', error_msg)
             raise
-        
         finally:
-            # Close connections
-            if self.db_cursor:
-                self.db_cursor.close()
-            if self.db_conn:
-                self.db_conn.close()
-            print("🔌 Database connections closed")
+            if self.checkpoint:
+                self.checkpoint.release()
 
 def main():
     """Main entry point for the ETL pipeline"""
-    pipeline = ETLPipeline()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the ETL pipeline")
+    parser.add_argument("--run-id", help="Resume a specific run")
+    parser.add_argument("--fresh", action="store_true", help="Start a new run instead of resuming")
+    args = parser.parse_args()
+    
+    pipeline = ETLPipeline(run_id=args.run_id, fresh=args.fresh)
     pipeline.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""
+Model Explanations
+Per-player TreeSHAP contributions computed in one batched pass after training,
+using XGBoost's built-in pred_contribs. Results are cached with each model
+version so API requests never compute SHAP values themselves.
+"""
+
+import numpy as np
+
+def compute_contributions(model, X_scaled):
+    """
+    Compute SHAP contributions for every row in one call.
+    Returns a float32 matrix of shape (rows, features + 1); the last column is
+    the bias (expected model output), so each row sums to the prediction.
+    """
+    import xgboost as xgb
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    contribs = booster.predict(xgb.DMatrix(np.asarray(X_scaled)), pred_contribs=True)
+    return contribs.astype(np.float32)
+
+def global_importance(contribs, features):
+    """Global feature importance as the mean absolute SHAP contribution per feature"""
+    feature_contribs = contribs[:, :len(features)]
+    mean_abs = np.abs(feature_contribs).mean(axis=0)
+    mean = feature_contribs.mean(axis=0)
+
+    importance = [
+        {
+            "feature": feature,
+            "importance_score": float(mean_abs[i]),
+            "mean_contribution": float(mean[i])
+        }
+        for i, feature in enumerate(features)
+    ]
+    importance.sort(key=lambda item: item["importance_score"], reverse=True)
+    return importance
+
+def explain_row(contribs_row, features, feature_values):
+    """Break a single prediction down into its per-feature contributions"""
+    contributions = [
+        {
+            "feature": feature,
+            "value": float(feature_values[i]),
+            "contribution": float(contribs_row[i])
+        }
+        for i, feature in enumerate(features)
+    ]
+    contributions.sort(key=lambda item: abs(item["contribution"]), reverse=True)
+    return {
+        "base_value": float(contribs_row[len(features)]),
+        "contributions": contributions
+    }
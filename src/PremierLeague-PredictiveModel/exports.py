@@ -0,0 +1,169 @@
+"""
+BI Exports
+Streams predictions joined with player data straight from the published
+snapshot as chunked CSV, NDJSON or Arrow IPC. Summary statistics are computed
+once, when a snapshot is published, and served by /api/export/summary - the
+single source of prediction summaries.
+"""
+
+import io
+import csv
+import json
+import math
+
+import numpy as np
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+DEFAULT_EXPORT_COLUMNS = [
+    'player_id', 'name', 'team', 'position', 'now_cost', 'value_season', 'predicted_value'
+]
+
+EXPORT_CHUNK_ROWS = 500
+
+class SummaryAccumulator:
+    """
+    Prediction summary as running totals (update() can be called per batch).
+    Accuracy only counts rows with a
+    non-zero actual value: a relative error against 0 is undefined, and
+    averaging it in is what produced "avg_accuracy": -Infinity before.
+    """
+
+    def __init__(self):
+        self.total_players = 0
+        self.predicted_count = 0
+        self.sum_predicted = 0.0
+        self.sum_actual = 0.0
+        self.actual_count = 0
+        self.sum_abs_error = 0.0
+        self.sum_accuracy = 0.0
+        self.accuracy_count = 0
+        self.top_predicted_value = -math.inf
+        self.top_predicted_player = None
+
+    def update(self, predicted, actual, names=None):
+        """Add a batch of predictions (and matching actual values) to the summary"""
+        predicted = np.asarray(predicted, dtype=float)
+        actual = np.asarray(actual, dtype=float)
+
+        finite_predicted = np.isfinite(predicted)
+        both_finite = finite_predicted & np.isfinite(actual)
+        # Relative accuracy is only meaningful against a non-zero actual value
+        has_accuracy = both_finite & (np.abs(actual) > 1e-9)
+
+        error = np.abs(predicted[both_finite] - actual[both_finite])
+        relative_error = (
+            np.abs(predicted[has_accuracy] - actual[has_accuracy]) / np.abs(actual[has_accuracy])
+        )
+
+        self.total_players += len(predicted)
+        self.predicted_count += int(finite_predicted.sum())
+        self.sum_predicted += float(predicted[finite_predicted].sum())
+        self.sum_actual += float(actual[both_finite].sum())
+        self.actual_count += int(both_finite.sum())
+        self.sum_abs_error += float(error.sum())
+        # Clip so a single wild miss cannot drag the average below 0
+        self.sum_accuracy += float(np.clip(1 - relative_error, 0, 1).sum())
+        self.accuracy_count += int(has_accuracy.sum())
+
+        if finite_predicted.any():
+            best = int(np.argmax(np.where(finite_predicted, predicted, -np.inf)))
+            if predicted[best] > self.top_predicted_value:
+                self.top_predicted_value = float(predicted[best])
+                if names is not None:
+                    self.top_predicted_player = names[best]
+        return self
+
+    def to_dict(self):
+        def mean(total, count):
+            return total / count if count else None
+
+        return {
+            "total_players": self.total_players,
+            "avg_predicted_value": mean(self.sum_predicted, self.predicted_count),
+            "avg_actual_value": mean(self.sum_actual, self.actual_count),
+            "mean_absolute_error": mean(self.sum_abs_error, self.actual_count),
+            "avg_accuracy": mean(self.sum_accuracy, self.accuracy_count),
+            "accuracy_players": self.accuracy_count,
+            "top_predicted_player": self.top_predicted_player,
+        }
+
+def summarize_predictions(predicted, actual, names=None):
+    """Summary statistics for a batch of predictions, in one vectorized pass"""
+    return SummaryAccumulator().update(predicted, actual, names).to_dict()
+
+def filter_rows(snapshot, team=None, position=None, min_predicted_value=None, max_now_cost=None):
+    """Return the row indices matching the filters, best predictions first"""
+    mask = np.ones(len(snapshot), dtype=bool)
+    if team:
+        mask &= np.asarray(snapshot.column('team')) == team
+    if position:
+        mask &= np.asarray(snapshot.column('position')) == position.upper()
+    if min_predicted_value is not None:
+        mask &= snapshot.column('predicted_value') >= min_predicted_value
+    if max_now_cost is not None:
+        mask &= snapshot.column('now_cost') <= max_now_cost
+
+    rows = np.flatnonzero(mask)
+    order = np.argsort(-snapshot.column('predicted_value')[rows], kind='stable')
+    return rows[order]
+
+def _chunks(rows, chunk_rows):
+    for start in range(0, len(rows), chunk_rows):
+        yield rows[start:start + chunk_rows]
+
+def stream_csv(snapshot, rows, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(rows, chunk_rows):
+        for record in snapshot.records(chunk, columns):
+            writer.writerow(['' if record[col] is None else record[col] for col in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stream_ndjson(snapshot, rows, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+    for chunk in _chunks(rows, chunk_rows):
+        yield ''.join(json.dumps(record) + '\n' for record in snapshot.records(chunk, columns))
+
+def stream_arrow(snapshot, rows, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+    import pyarrow as pa
+
+    numeric = set(snapshot.manifest["numeric_columns"])
+    schema = pa.schema([
+        (col, pa.int64() if col == 'player_id' else pa.float64() if col in numeric else pa.string())
+        for col in columns
+    ])
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in _chunks(rows, chunk_rows):
+            arrays = []
+            for col in columns:
+                values = snapshot.column(col)
+                if col in numeric:
+                    # Gather from the memory-mapped column without a Python loop
+                    data = np.asarray(values)[chunk]
+                    arrays.append(pa.array(data.astype(np.int64) if col == 'player_id' else data,
+                                           from_pandas=True))
+                else:
+                    arrays.append(pa.array([values[row] for row in chunk], pa.string()))
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # End-of-stream marker written when the writer closes
+    yield sink.getvalue()
+
+STREAMERS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+    "arrow": stream_arrow,
+}
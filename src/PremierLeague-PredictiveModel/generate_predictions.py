@@ -8,43 +8,34 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 import xgboost as xgb
-import psycopg2
 from datetime import datetime
 from dotenv import load_dotenv
 import gspread
 from google.oauth2.service_account import Credentials
 import json
+from explain import compute_contributions, global_importance
+from intervals import IntervalModel, INTERVAL_QUANTILES, INTERVAL_COLUMNS
+from storage import get_storage, sync_replica, PREDICTION_COLUMNS
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_database_connection():
-    """Get PostgreSQL database connection"""
-    database_url = os.getenv("DATABASE_URL")
-    if not database_url:
-        raise ValueError("DATABASE_URL environment variable not set")
-    return psycopg2.connect(database_url)
-
-def load_data_from_database():
+def load_data_from_database(storage=None):
     """Load player data from the database"""
-    conn = get_database_connection()
-    try:
-        # Load all available feature columns from database
-        query = """
-            SELECT 
-                player_id, name, team, position,
-                minutes, goals_scored, assists, clean_sheets,
-                goals_conceded, yellow_cards, red_cards,
-                saves, bonus, influence, creativity, threat,
-                value_season
-            FROM players
-            WHERE minutes IS NOT NULL
-        """
-        df = pd.read_sql_query(query, conn)
-        print(f"✅ Loaded {len(df)} players from database")
-        return df
-    finally:
-        conn.close()
+    storage = storage or get_storage()
+    # Load all available feature columns from database
+    df = storage.load_players(
+        columns=[
+            'player_id', 'name', 'team', 'position',
+            'minutes', 'goals_scored', 'assists', 'clean_sheets',
+            'goals_conceded', 'yellow_cards', 'red_cards',
+            'saves', 'bonus', 'influence', 'creativity', 'threat',
+            'value_season'
+        ],
+        only_with_minutes=True
+    )
+    print(f"✅ Loaded {len(df)} players from {storage.name} database")
+    return df
 
 def train_model(df):
     """Train the XGBoost model"""
@@ -89,8 +80,15 @@ def train_model(df):
     print(f"✅ Model trained on {len(df_clean)} players")
     return model, scaler, features
 
-def generate_predictions(model, scaler, features, df):
-    """Generate predictions for all players"""
+def train_interval_model(df, scaler, features):
+    """Train the multi-quantile model that gives every prediction an interval"""
+    df_clean = df.dropna(subset=features + ['value_season'])
+    interval_model = IntervalModel.fit(scaler.transform(df_clean[features]), df_clean['value_season'])
+    print(f"✅ Interval model trained (quantiles {INTERVAL_QUANTILES})")
+    return interval_model
+
+def generate_predictions(model, scaler, features, df, interval_model=None):
+    """Generate predictions (and, with an interval model, their intervals) for all players"""
     # Filter to players with all required features
     df_features = df.dropna(subset=features).copy()
     
@@ -103,120 +101,54 @@ def generate_predictions(model, scaler, features, df):
     
     # Add predictions to dataframe (convert to Python float to avoid numpy type issues)
     df_features['predicted_value'] = predictions.astype(float)
+    columns = ['player_id', 'predicted_value']
+    
+    # Bounds and confidence for every player from the same scaled batch
+    if interval_model is not None:
+        for col, values in zip(INTERVAL_COLUMNS, interval_model.predict(X_scaled, predictions)):
+            df_features[col] = values
+        columns += INTERVAL_COLUMNS
     
     print(f"✅ Generated {len(predictions)} predictions")
-    return df_features[['player_id', 'predicted_value']]
+    return df_features[columns]
 
-def store_predictions(df_predictions, model_version="v1.0"):
+def store_predictions(df_predictions, model_version="v1.0", storage=None):
     """Store predictions in the database - updates existing predictions to avoid duplicates"""
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    
+    storage = storage or get_storage()
     try:
-        # First, delete existing predictions for this model_version to avoid duplicates
-        delete_query = "DELETE FROM predictions WHERE model_version = %s"
-        cursor.execute(delete_query, (model_version,))
-        deleted_count = cursor.rowcount
-        if deleted_count > 0:
-            print(f"   Deleted {deleted_count} old predictions for model version {model_version}")
-        
-        # Insert new predictions
-        insert_query = """
-            INSERT INTO predictions (player_id, predicted_value, model_version, prediction_date)
-            VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
-        """
-        
-        # Prepare data for insertion (similar to ETL pipeline approach)
-        # Convert DataFrame to list of tuples
-        predictions_data = [
-            (int(row[0]), float(row[1]), model_version)
-            for row in df_predictions[['player_id', 'predicted_value']].values
-        ]
-        
-        cursor.executemany(insert_query, predictions_data)
-        conn.commit()
-        
-        print(f"✅ Stored {len(predictions_data)} predictions in database")
-    
+        stored = storage.store_predictions(df_predictions, model_version)
+        print(f"✅ Stored {stored} predictions in database")
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error storing predictions: {str(e)}")
         raise
-    finally:
-        cursor.close()
-        conn.close()
 
-def get_all_predictions_with_players():
+def store_feature_importance(importance, model_version="v1.0", storage=None):
+    """Store global SHAP feature importance for a model version"""
+    storage = storage or get_storage()
+    try:
+        stored = storage.store_feature_importance(importance, model_version)
+        print(f"✅ Stored feature importance for {stored} features")
+    except Exception as e:
+        print(f"❌ Error storing feature importance: {str(e)}")
+        raise
+
+def get_all_predictions_with_players(storage=None):
     """Get all predictions joined with player data from database"""
-    conn = get_database_connection()
+    storage = storage or get_storage()
     try:
         # Get the most recent predictions for each player
-        query = """
-            WITH latest_predictions AS (
-                SELECT 
-                    player_id,
-                    MAX(prediction_date) as latest_date
-                FROM predictions
-                GROUP BY player_id
-            )
-            SELECT 
-                p.player_id,
-                p.name,
-                p.team,
-                p.position,
-                p.value_season,
-                pred.predicted_value,
-                pred.model_version,
-                pred.prediction_date
-            FROM predictions pred
-            JOIN players p ON pred.player_id = p.player_id
-            JOIN latest_predictions lp ON pred.player_id = lp.player_id 
-                AND pred.prediction_date = lp.latest_date
-            ORDER BY pred.predicted_value DESC
-        """
-        df = pd.read_sql_query(query, conn)
+        df = storage.latest_predictions()
         print(f"✅ Fetched {len(df)} predictions with player data")
         return df
     except Exception as e:
         print(f"⚠️  Error fetching predictions: {str(e)}")
         # Return empty dataframe with expected columns
-        return pd.DataFrame(columns=['player_id', 'name', 'team', 'position', 
-                                     'value_season', 'predicted_value', 'model_version', 'prediction_date'])
-    finally:
-        conn.close()
+        return pd.DataFrame(columns=PREDICTION_COLUMNS)
 
-def get_top_predictions(limit=25):
+def get_top_predictions(limit=25, storage=None):
     """Get top predictions from database (for verification) - only latest per player"""
-    conn = get_database_connection()
-    try:
-        query = """
-            WITH latest_predictions AS (
-                SELECT 
-                    player_id,
-                    MAX(prediction_date) as latest_date
-                FROM predictions
-                GROUP BY player_id
-            )
-            SELECT 
-                p.player_id,
-                p.name,
-                p.team,
-                p.position,
-                p.value_season,
-                pred.predicted_value,
-                pred.model_version,
-                pred.prediction_date
-            FROM predictions pred
-            JOIN players p ON pred.player_id = p.player_id
-            JOIN latest_predictions lp ON pred.player_id = lp.player_id 
-                AND pred.prediction_date = lp.latest_date
-            ORDER BY pred.predicted_value DESC
-            LIMIT %s
-        """
-        df = pd.read_sql_query(query, conn, params=(limit,))
-        return df
-    finally:
-        conn.close()
+    storage = storage or get_storage()
+    return storage.latest_predictions(limit=limit)
 
 def setup_google_sheets():
     """Setup Google Sheets API connection"""
@@ -285,7 +217,8 @@ def load_predictions_to_google_sheets(df_predictions):
         # Select columns to include
         sheets_columns = [
             'player_id', 'name', 'team', 'position', 
-            'value_season', 'predicted_value', 'model_version', 'prediction_date'
+            'value_season', 'predicted_value', 'prediction_lower', 'prediction_upper',
+            'confidence_score', 'model_version', 'prediction_date'
         ]
         
         # Keep only columns that exist
@@ -329,18 +262,29 @@ def main():
     print(f"⏰ Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
+        storage = get_storage()
+        
         # Load data from database
-        df = load_data_from_database()
+        df = load_data_from_database(storage)
         
         # Train model
         model, scaler, features = train_model(df)
+        interval_model = train_interval_model(df, scaler, features)
         
         # Generate predictions
-        df_predictions = generate_predictions(model, scaler, features, df)
+        df_predictions = generate_predictions(model, scaler, features, df, interval_model)
         
         # Store predictions in database
         model_version = "v1.0"
-        store_predictions(df_predictions, model_version)
+        store_predictions(df_predictions, model_version, storage)
+        
+        # Explain the model with one batched TreeSHAP pass over all players
+        X_scaled = scaler.transform(df.dropna(subset=features)[features])
+        contribs = compute_contributions(model, X_scaled)
+        store_feature_importance(global_importance(contribs, features), model_version, storage)
+        
+        # Refresh the local read replica the API serves from
+        sync_replica(storage)
         
         # Prepare predictions with player data for Google Sheets
         print("\n📥 Preparing predictions with player data for Google Sheets...")
@@ -374,7 +318,8 @@ def main():
         # Reorder columns for Google Sheets
         df_predictions_full = df_predictions_full[[
             'player_id', 'name', 'team', 'position', 
-            'value_season', 'predicted_value', 'model_version', 'prediction_date'
+            'value_season', 'predicted_value', 'prediction_lower', 'prediction_upper',
+            'confidence_score', 'model_version', 'prediction_date'
         ]]
         
         print(f"   Final dataframe shape: {df_predictions_full.shape}")
@@ -385,7 +330,7 @@ def main():
         
         # Show top predictions
         print("\n📊 Top 10 Predictions:")
-        top_predictions = get_top_predictions(limit=10)
+        top_predictions = get_top_predictions(limit=10, storage=storage)
         print(top_predictions[['name', 'team', 'value_season', 'predicted_value']].to_string(index=False))
         
         print(f"\n✅ Prediction generation completed successfully!")
@@ -0,0 +1,62 @@
+"""
+Prediction Intervals
+A single multi-quantile XGBoost model (objective reg:quantileerror with one
+quantile_alpha per bound) predicts the lower and upper bound of every
+player's value in one batched call. This replaces estimating uncertainty by
+retraining the point model with many seeds.
+
+confidence_score maps the interval width onto 0-1: an interval as wide as
+the 10th-90th percentile spread of value_season across all players scores 0,
+a zero-width interval scores 1.
+"""
+
+import numpy as np
+
+# Lower and upper quantiles of the interval (80% nominal coverage)
+INTERVAL_QUANTILES = [0.1, 0.9]
+
+# Columns added next to predicted_value for every player
+INTERVAL_COLUMNS = ['prediction_lower', 'prediction_upper', 'confidence_score']
+
+class IntervalModel:
+    """Multi-quantile model plus the target spread used to score interval widths"""
+
+    def __init__(self, model, spread):
+        self.model = model
+        self.spread = spread
+
+    @classmethod
+    def fit(cls, X_scaled, y, n_estimators=100):
+        import xgboost as xgb
+
+        model = xgb.XGBRegressor(
+            objective='reg:quantileerror',
+            quantile_alpha=np.array(INTERVAL_QUANTILES),
+            n_estimators=n_estimators,
+            learning_rate=0.1,
+            max_depth=5,
+            random_state=42,
+            n_jobs=-1
+        )
+        model.fit(X_scaled, y)
+        low, high = np.quantile(np.asarray(y, dtype=float), INTERVAL_QUANTILES)
+        return cls(model, float(high - low))
+
+    def predict(self, X_scaled, predicted):
+        """
+        Return (lower, upper, confidence_score) arrays for every row at once.
+        Bounds are widened to contain the point prediction, which comes from a
+        separately trained model and can fall just outside them.
+        """
+        bounds = np.asarray(self.model.predict(X_scaled), dtype=float).reshape(len(predicted), -1)
+        # Independently fitted quantiles can cross; sorting restores lower <= upper
+        bounds.sort(axis=1)
+        predicted = np.asarray(predicted, dtype=float)
+        lower = np.minimum(bounds[:, 0], predicted)
+        upper = np.maximum(bounds[:, -1], predicted)
+
+        if self.spread > 0:
+            confidence = 1.0 - np.clip((upper - lower) / self.spread, 0.0, 1.0)
+        else:
+            confidence = np.zeros(len(predicted))
+        return lower, upper, np.round(confidence, 2)
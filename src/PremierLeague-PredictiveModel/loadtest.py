@@ -0,0 +1,302 @@
+"""
+Load Test
+Drives the read endpoints of the FastAPI app with a configurable request mix
+and concurrency, then reports throughput and latency percentiles.
+
+By default requests go in-process through an ASGI transport, against
+synthetic players, so it needs no Kaggle or Neon access. --uvicorn serves the
+same synthetic data from a local uvicorn with several workers instead. --url
+tests an already running server with its own data: player ids and names for
+the requests are taken from that server's export endpoint.
+
+Usage:
+    python loadtest.py --requests 5000 --concurrency 50
+    python loadtest.py --mix top_players=8,search=2 --max-p99-ms 50 --min-rps 500
+    python loadtest.py --uvicorn --workers 4 --duration 30
+    python loadtest.py --url http://localhost:8000 --duration 30
+
+Exits with status 1 if any threshold is missed.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+
+import numpy as np
+
+DEFAULT_MIX = "top_players=6,search=2,explain=1,similar=1,feature_importance=1,latest=1,summary=1"
+
+TEAMS = [
+    'Arsenal', 'Aston Villa', 'Bournemouth', 'Brentford', 'Brighton', 'Burnley', 'Chelsea',
+    'Crystal Palace', 'Everton', 'Fulham', 'Leeds', 'Liverpool', 'Man City', 'Man Utd',
+    'Newcastle', 'Nott\'m Forest', 'Sunderland', 'Spurs', 'West Ham', 'Wolves'
+]
+POSITIONS = ['GKP', 'DEF', 'MID', 'FWD']
+FIRST_NAMES = ['Fábio', 'João', 'Martin', 'Bruno', 'Mohamed', 'Erling', 'Bukayo', 'Cole', 'Declan', 'Jérémy']
+LAST_NAMES = ['Vieira', 'Ødegaard', 'Fernandes', 'Salah', 'Haaland', 'Saka', 'Palmer', 'Rice', 'Doku', 'Gvardiol']
+
+def make_synthetic_players(n_players=800, seed=42):
+    """Random players shaped like the Kaggle players.csv"""
+    import pandas as pd
+    from snapshot import FEATURES
+
+    rng = np.random.default_rng(seed)
+    minutes = rng.integers(0, 3420, n_players)
+    played = minutes / 3420
+
+    df = pd.DataFrame({
+        'player_id': np.arange(1, n_players + 1),
+        'name': [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}" for i in range(n_players)],
+        'team': rng.choice(TEAMS, n_players),
+        'position': rng.choice(POSITIONS, n_players, p=[0.1, 0.35, 0.4, 0.15]),
+        'now_cost': rng.integers(40, 150, n_players).astype(float),
+        'status': 'a',
+    })
+    df['web_name'] = df['name'].str.split().str[1]
+    for feature in FEATURES:
+        scale = 300 if feature in ('influence', 'creativity', 'threat') else 10
+        df[feature] = np.round(rng.gamma(2.0, scale / 2, n_players) * played, 1)
+    df['minutes'] = minutes
+    df['value_season'] = np.round(
+        0.002 * df['minutes'] + 0.5 * df['goals_scored'] + 0.3 * df['assists']
+        + 0.01 * df['influence'] + rng.normal(0, 0.5, n_players), 1
+    ).clip(lower=0)
+    return df
+
+def prepare_environment(n_players, workdir):
+    """Publish a synthetic snapshot and replica, and point the app at them"""
+    os.environ["SNAPSHOT_DIR"] = os.path.join(workdir, "snapshots")
+    os.environ["SQLITE_DATABASE_PATH"] = os.path.join(workdir, "fpl_local.db")
+
+    # Imported after the environment is set: both read it at import time
+    import snapshot as snapshots
+    from storage import get_replica
+
+    df = make_synthetic_players(n_players)
+    model, scaler, scored = snapshots.train_model(df)
+    snapshots.publish_snapshot(model, scaler, scored)
+
+    replica = get_replica()
+    replica.upsert_players(df)
+    replica.store_predictions(scored[['player_id', 'predicted_value']], "loadtest")
+    return df
+
+def start_uvicorn(workdir, port, workers, timeout=120):
+    """Serve the synthetic snapshot and replica from a local uvicorn; returns (process, url)"""
+    import httpx
+
+    env = dict(
+        os.environ,
+        SNAPSHOT_DIR=os.path.join(workdir, "snapshots"),
+        SQLITE_DATABASE_PATH=os.path.join(workdir, "fpl_local.db"),
+        PIPELINE_LOCK_DIR=os.path.join(workdir, "locks"),
+        # Empty rather than unset so load_dotenv() does not fill it in from .env
+        DATABASE_URL="",
+        FPL_OFFLINE="1",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "premierleague_MLModel:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if httpx.get(f"{url}/readyz").status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() > deadline:
+            process.terminate()
+            raise TimeoutError(f"uvicorn was not ready within {timeout} seconds")
+        time.sleep(0.1)
+
+async def fetch_players(client):
+    """Player ids and names served by the target, to build requests from"""
+    import pandas as pd
+
+    response = await client.get("/api/export/predictions?format=ndjson&columns=player_id,web_name")
+    response.raise_for_status()
+    return pd.DataFrame([json.loads(line) for line in response.text.splitlines() if line])
+
+def parse_mix(mix):
+    """Parse 'name=weight,...' into {name: weight}"""
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+# Request builders for each read endpoint, given the players being served
+ENDPOINTS = {
+    "top_players": lambda rng, df: "/api/top_players",
+    "search": lambda rng, df: f"/api/players/search?q={rng.choice(df['web_name'])[:rng.integers(2, 6)]}",
+    "explain": lambda rng, df: f"/api/players/{rng.choice(df['player_id'])}/explain",
+    "similar": lambda rng, df: (
+        f"/api/players/{rng.choice(df['player_id'])}/similar?k=10&max_cost={rng.integers(50, 150)}"
+    ),
+    "feature_importance": lambda rng, df: "/api/feature-importance",
+    "latest": lambda rng, df: "/api/predictions/latest?limit=25",
+    "summary": lambda rng, df: "/api/export/summary",
+    "export": lambda rng, df: f"/api/export/predictions?format=ndjson&position={rng.choice(POSITIONS)}",
+}
+
+async def run_load(client, df, mix, concurrency, total_requests=None, duration=None, seed=0):
+    """Issue requests from `concurrency` workers; returns {endpoint: [(latency, ok), ...]}"""
+    names = list(mix)
+    weights = np.array([mix[name] for name in names])
+    weights = weights / weights.sum()
+
+    results = defaultdict(list)
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker(worker_id):
+        nonlocal issued
+        rng = np.random.default_rng(seed + worker_id)
+        while True:
+            if total_requests is not None and issued >= total_requests:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            issued += 1
+
+            name = names[rng.choice(len(names), p=weights)]
+            path = ENDPOINTS[name](rng, df)
+            start_time = time.perf_counter()
+            try:
+                response = await client.get(path)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            results[name].append((time.perf_counter() - start_time, ok))
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return results, time.perf_counter() - start_time
+
+def summarize(results, elapsed):
+    """Throughput and latency percentiles, per endpoint and overall"""
+    def stats(samples):
+        latencies = np.array([latency for latency, _ in samples]) * 1000
+        errors = sum(1 for _, ok in samples if not ok)
+        return {
+            "requests": len(samples),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "max_ms": round(float(latencies.max()), 3),
+        }
+
+    report = {name: stats(samples) for name, samples in sorted(results.items()) if samples}
+    report["overall"] = stats([sample for samples in results.values() for sample in samples])
+    report["overall"]["elapsed_seconds"] = round(elapsed, 3)
+    return report
+
+def check_thresholds(overall, args):
+    """Return a list of threshold violations"""
+    failures = []
+    if args.min_rps is not None and overall["rps"] < args.min_rps:
+        failures.append(f"throughput {overall['rps']} rps < {args.min_rps} rps")
+    if args.max_p95_ms is not None and overall["p95_ms"] > args.max_p95_ms:
+        failures.append(f"p95 {overall['p95_ms']} ms > {args.max_p95_ms} ms")
+    if args.max_p99_ms is not None and overall["p99_ms"] > args.max_p99_ms:
+        failures.append(f"p99 {overall['p99_ms']} ms > {args.max_p99_ms} ms")
+    if overall["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {overall['error_rate']} > {args.max_error_rate}")
+    return failures
+
+async def main_async(args):
+    import httpx
+
+    mix = parse_mix(args.mix)
+    server_process = None
+    if args.url:
+        # Someone else's data: no synthetic setup, requests use the server's players
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        df = None
+    elif args.uvicorn:
+        workdir = tempfile.mkdtemp(prefix="fpl-loadtest-")
+        df = prepare_environment(args.players, workdir)
+        server_process, url = start_uvicorn(workdir, args.port, args.workers)
+        client = httpx.AsyncClient(base_url=url, timeout=30)
+    else:
+        workdir = tempfile.mkdtemp(prefix="fpl-loadtest-")
+        df = prepare_environment(args.players, workdir)
+        import premierleague_MLModel as api
+        # ASGI transport does not run startup events, so load the snapshot directly
+        api._load_model_in_background()
+        if api.STARTUP_STATE["status"] != "ready":
+            raise RuntimeError(f"App failed to start: {api.STARTUP_STATE['error']}")
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=api.app), base_url="http://loadtest", timeout=30
+        )
+
+    try:
+        async with client:
+            if df is None:
+                df = await fetch_players(client)
+            if args.warmup:
+                await run_load(client, df, mix, args.concurrency, total_requests=args.warmup)
+            results, elapsed = await run_load(
+                client, df, mix, args.concurrency,
+                total_requests=None if args.duration else args.requests,
+                duration=args.duration
+            )
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+    return summarize(results, elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Premier League MVP Predictor API")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Test a running server (and its data) instead of the in-process app")
+    target.add_argument("--uvicorn", action="store_true",
+                        help="Serve the synthetic data from a local uvicorn instead of in-process")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn workers (with --uvicorn)")
+    parser.add_argument("--port", type=int, default=8020, help="uvicorn port (with --uvicorn)")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"Weighted endpoint mix (endpoints: {', '.join(ENDPOINTS)})")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of --requests")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--players", type=int, default=800, help="Number of synthetic players")
+    parser.add_argument("--min-rps", type=float)
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--max-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # The app resolves ./data relative to this directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2))
+
+    failures = check_thresholds(report["overall"], args)
+    if failures:
+        print("❌ Load test failed: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"✅ Load test passed: {report['overall']['rps']} rps, p99 {report['overall']['p99_ms']} ms")
+
+if __name__ == "__main__":
+    main()
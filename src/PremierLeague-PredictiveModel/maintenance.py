@@ -0,0 +1,80 @@
+"""
+Database Maintenance for Premier League MVP Predictor
+Keeps the predictions and player_history tables bounded as runs accumulate:
+1. Creates the upcoming monthly partitions (Postgres)
+2. Compacts prediction batches older than PREDICTION_DETAIL_DAYS into
+   per-model-version summaries (prediction_summaries), keeping the latest
+   batch of every model version in full
+3. Drops data older than the retention, optionally archiving it to Parquet first
+   (the latest batch of every model version is kept here too)
+
+The scheduled workflow calls POST /api/run-maintenance once a day. It can
+also be run by hand:
+    python maintenance.py [--archive] [--retention-days 365]
+"""
+
+import os
+import json
+import argparse
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from storage import get_storage
+
+# Load environment variables from .env file (for local development)
+load_dotenv()
+
+# Prediction batches keep per-player rows for this long, then only their summary
+PREDICTION_DETAIL_DAYS = int(os.getenv("PREDICTION_DETAIL_DAYS", "30"))
+# Rows older than these are dropped (or archived) entirely
+PREDICTION_RETENTION_DAYS = int(os.getenv("PREDICTION_RETENTION_DAYS", "365"))
+PLAYER_HISTORY_RETENTION_DAYS = int(os.getenv("PLAYER_HISTORY_RETENTION_DAYS", "365"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./data/archive")
+PARTITION_MONTHS_AHEAD = 2
+
+def run_maintenance(storage=None, now=None, detail_days=PREDICTION_DETAIL_DAYS,
+                    retention_days=PREDICTION_RETENTION_DAYS,
+                    history_retention_days=PLAYER_HISTORY_RETENTION_DAYS,
+                    archive_dir=None):
+    """Run every maintenance step and return a report of what changed"""
+    storage = storage or get_storage()
+    now = now or datetime.now()
+    report = {}
+
+    print("🗓️  Creating upcoming partitions...")
+    report["partitions_created"] = storage.ensure_partitions(PARTITION_MONTHS_AHEAD, now)
+    print(f"✅ Created {len(report['partitions_created'])} partitions")
+
+    print(f"🗜️  Compacting prediction batches older than {detail_days} days...")
+    summarized, deleted = storage.compact_predictions(now - timedelta(days=detail_days))
+    report["batches_compacted"] = summarized
+    report["prediction_rows_compacted"] = deleted
+    print(f"✅ Compacted {summarized} batches ({deleted} rows) into prediction_summaries")
+
+    for table, days in [('predictions', retention_days), ('player_history', history_retention_days)]:
+        print(f"🧹 Expiring {table} older than {days} days{' (archiving)' if archive_dir else ''}...")
+        expired = storage.expire_rows(table, now - timedelta(days=days), archive_dir)
+        report[f"{table}_rows_expired"] = expired
+        print(f"✅ Removed {expired} rows from {table}")
+
+    return report
+
+def main():
+    """Main entry point for database maintenance"""
+    parser = argparse.ArgumentParser(description="Compact and expire prediction history")
+    parser.add_argument("--detail-days", type=int, default=PREDICTION_DETAIL_DAYS)
+    parser.add_argument("--retention-days", type=int, default=PREDICTION_RETENTION_DAYS)
+    parser.add_argument("--history-retention-days", type=int, default=PLAYER_HISTORY_RETENTION_DAYS)
+    parser.add_argument("--archive", action="store_true",
+                        help=f"Write expired rows to Parquet under ARCHIVE_DIR ({ARCHIVE_DIR}) before dropping them")
+    args = parser.parse_args()
+
+    report = run_maintenance(
+        detail_days=args.detail_days,
+        retention_days=args.retention_days,
+        history_retention_days=args.history_retention_days,
+        archive_dir=ARCHIVE_DIR if args.archive else None
+    )
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,34 @@
+import time
+
+# Record when the module started importing so startup cost can be reported
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-import pandas as pd
+import threading
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-import xgboost as xgb
-import kaggle
-import time
 from fastapi import FastAPI, Request, Header, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
 
+import snapshot as snapshots
+from explain import explain_row
+import exports
+from search import PlayerSearchIndex, normalize
+from intervals import INTERVAL_COLUMNS
+from responses import (
+    PayloadCache, respond, json_response, choose_encoding, compress_stream, CACHED_LEVELS, DYNAMIC_LEVELS
+)
+from admission import SingleFlight, ConcurrencyLimiter, run_exclusive
+
+# pandas, scikit-learn, xgboost and kaggle are imported lazily inside the
+# functions that need them. Importing kaggle authenticates immediately and
+# xgboost/sklearn add seconds to import time, which would delay the server
+# from accepting its first request.
+
 app = FastAPI()
 
 # Enable CORS for localhost
@@ -26,94 +43,437 @@ app.add_middleware(
 # Mount templates directory
 templates = Jinja2Templates(directory="templates")
 
-# Global variables for model and data
-MODEL = None
-SCALER = None
-DF = None
-
-def download_dataset():
-    dataset_name = 'meraxes10/fantasy-premier-league-dataset-2025-2026'
-    download_path = './data/'
-    os.makedirs(download_path, exist_ok=True)
-    os.environ["KAGGLE_USERNAME"] = os.getenv("KAGGLE_USERNAME")
-    os.environ["KAGGLE_KEY"] = os.getenv("KAGGLE_KEY")
-    kaggle.api.authenticate()
-    kaggle.api.dataset_download_files(dataset_name, path=download_path, unzip=True)
-    print("Dataset downloaded successfully!")
+# How often each worker's poller thread checks whether a newer snapshot has been published
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "30"))
 
-def initialize_model():
-    global MODEL, SCALER, DF
-    
-    # Read the dataset
-    df = pd.read_csv('./data/players.csv')
-    
-    # Select relevant features
-    features = [
-        'minutes', 'goals_scored', 'assists', 'clean_sheets',
-        'goals_conceded', 'own_goals', 'penalties_saved',
-        'penalties_missed', 'yellow_cards', 'red_cards',
-        'saves', 'bonus', 'influence', 'creativity', 'threat'
-    ]
-    
-    # Clean the data
-    df = df.dropna(subset=features + ['value_season'])
-    X = df[features]
-    y = df['value_season']
-    
-    # Train the model
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    
-    # Initialize and train XGBoost model
-    model = xgb.XGBRegressor(
-        n_estimators=100,
-        learning_rate=0.1,
-        max_depth=5,
-        random_state=42,
-        n_jobs=-1
-    )
-    model.fit(X_scaled, y)
+# The published snapshot (model + scored players), memory-mapped read-only.
+# Every worker maps the same files, so memory is shared between processes.
+SNAPSHOT = None
+# Serializes refreshes from the poller thread and the ETL endpoint
+_REFRESH_LOCK = threading.Lock()
+
+# Player search index, updated incrementally whenever a new snapshot is mapped
+SEARCH_INDEX = PlayerSearchIndex()
+SEARCH_FIELDS = ['name', 'web_name', 'team']
+
+# Guards swapping SNAPSHOT and SEARCH_INDEX together (refreshes also run in the thread pool)
+_SNAPSHOT_LOCK = threading.Lock()
+
+# Nearest-neighbour engine for the current snapshot (built on first use)
+SIMILARITY = None
+
+# Read-endpoint responses, encoded (and compressed) once per snapshot version
+PAYLOADS = PayloadCache()
+
+# Admission control (per worker). Pipelines run one at a time, and a request
+# for a pipeline that is already running joins it instead of starting another.
+PIPELINES = ConcurrencyLimiter(
+    "pipeline", limit=1, max_queue=int(os.getenv("PIPELINE_MAX_QUEUE", "2")), retry_after=60
+)
+PIPELINE_FLIGHTS = SingleFlight()
+# Lock files shared by every worker, so a pipeline runs once across all of them
+PIPELINE_LOCK_DIR = os.getenv("PIPELINE_LOCK_DIR", "./data/locks")
+
+# Reads that do real work: payload cache misses and database queries
+EXPENSIVE_READS = ConcurrencyLimiter(
+    "read",
+    limit=int(os.getenv("READ_MAX_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("READ_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("READ_QUEUE_TIMEOUT_SECONDS", "5")),
+    retry_after=1
+)
+
+# Local SQLite read replica, synced after each prediction batch (opened on first use)
+REPLICA = None
+
+# Startup progress, reported by /readyz
+STARTUP_STATE = {
+    "status": "starting",  # 'starting', 'loading', 'ready', 'failed'
+    "source": None,        # 'snapshot' (mapped an existing one) or 'built'
+    "version": None,
+    "error": None,
+    "import_seconds": None,
+    "load_seconds": None,
+    "first_request_seconds": None,
+}
+
+def index_players(snapshot, index):
+    """Return a copy of the search index brought in line with the players in a snapshot"""
+    columns = {field: snapshot.column(field) for field in SEARCH_FIELDS}
+    players = {
+        int(pid): {field: columns[field][row] for field in SEARCH_FIELDS}
+        for row, pid in enumerate(snapshot.column('player_id'))
+    }
+    # Searches running in other threads keep using the old index until the swap
+    index = index.copy()
+    added, changed, removed = index.update(players)
+    print(f"🔎 Search index updated: {added} added, {changed} changed, {removed} removed")
+    return index
+
+def switch_snapshot(snapshot):
+    """Index a snapshot's players, then publish the snapshot and its index together"""
+    global SNAPSHOT, SEARCH_INDEX
     
-    # Store in global variables
-    MODEL = model
-    SCALER = scaler
-    DF = df
+    with _SNAPSHOT_LOCK:
+        base_index = SEARCH_INDEX
+    index = index_players(snapshot, base_index)
+    with _SNAPSHOT_LOCK:
+        SNAPSHOT, SEARCH_INDEX = snapshot, index
+
+def current_search():
+    """The snapshot and the search index built from it, as a consistent pair"""
+    with _SNAPSHOT_LOCK:
+        return SNAPSHOT, SEARCH_INDEX
+
+def initialize_model():
+    snapshot, built = snapshots.ensure_snapshot()
+    switch_snapshot(snapshot)
+    STARTUP_STATE["source"] = "built" if built else "snapshot"
+    STARTUP_STATE["version"] = snapshot.version
+
+def _load_model_in_background():
+    """Load the model without blocking the server from answering requests"""
+    STARTUP_STATE["status"] = "loading"
+    start_time = time.perf_counter()
+    try:
+        initialize_model()
+        STARTUP_STATE["load_seconds"] = round(time.perf_counter() - start_time, 3)
+        STARTUP_STATE["status"] = "ready"
+        print(f"✅ Model ready in {STARTUP_STATE['load_seconds']} seconds "
+              f"(source: {STARTUP_STATE['source']}, version: {STARTUP_STATE['version']})")
+        threading.Thread(target=_poll_snapshots, daemon=True).start()
+    except Exception as e:
+        STARTUP_STATE["status"] = "failed"
+        STARTUP_STATE["error"] = str(e)
+        print(f"❌ Model loading failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+def _poll_snapshots():
+    """
+    Switch to newly published snapshots in the background. Loading strings and
+    rebuilding the search index takes tens of milliseconds, which must not run
+    on the event loop, so request handlers only ever read the current snapshot.
+    """
+    while True:
+        time.sleep(SNAPSHOT_POLL_SECONDS)
+        try:
+            refresh_snapshot()
+        except Exception as e:
+            print(f"⚠️  Snapshot refresh failed: {str(e)}")
+
+def refresh_snapshot():
+    """Switch to a newer published snapshot, if there is one (blocking; never call it on the event loop)"""
+    with _REFRESH_LOCK:
+        if SNAPSHOT is not None and snapshots.current_version() not in (None, SNAPSHOT.version):
+            snapshot = snapshots.load_snapshot()
+            if snapshot is not None:
+                switch_snapshot(snapshot)
+                STARTUP_STATE["version"] = snapshot.version
+                print(f"🔄 Switched to snapshot {snapshot.version}")
+    return SNAPSHOT
 
 @app.on_event("startup")
 async def startup_event():
-    download_dataset()
-    initialize_model()
+    threading.Thread(target=_load_model_in_background, daemon=True).start()
+
+def _not_ready_response():
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "error",
+            "error": "Model is not ready yet",
+            "startup": STARTUP_STATE
+        },
+        headers={"Retry-After": "5"}
+    )
+
+def check_position(snapshot, position):
+    """Reject a position filter that matches no position in the snapshot"""
+    if not position:
+        return
+    valid_positions = sorted(set(snapshot.column('position')) - {''})
+    if position.upper() not in valid_positions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown position '{position}'. Use one of: {', '.join(valid_positions)}"
+        )
+
+async def cached_response(request, snapshot, key, build, levels=DYNAMIC_LEVELS):
+    """
+    Serve a snapshot payload from PAYLOADS. Misses, and variants not compressed
+    yet, are built in the thread pool under admission control; concurrent misses
+    for the same key share one build. Pass CACHED_LEVELS for payloads that
+    depend only on the snapshot version.
+    """
+    encoding = choose_encoding(request.headers.get('accept-encoding'))
+    entry = PAYLOADS.peek(snapshot.version, key)
+    if entry is None or not entry.has_variant(encoding):
+        async with EXPENSIVE_READS.slot():
+            entry = await run_in_threadpool(PAYLOADS.get, snapshot.version, key, build, levels, encoding)
+    return respond(request, entry)
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness check - answers as soon as the process is serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness check - succeeds once the model has been loaded"""
+    if STARTUP_STATE["status"] != "ready":
+        return JSONResponse(status_code=503, content=STARTUP_STATE)
+    return STARTUP_STATE
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/api/top_players")
-async def get_top_players():
+async def get_top_players(request: Request):
+    if STARTUP_STATE["status"] != "ready":
+        return _not_ready_response()
+    
     try:
-        # Make predictions using the stored model
-        X = DF[[
-            'minutes', 'goals_scored', 'assists', 'clean_sheets',
-            'goals_conceded', 'own_goals', 'penalties_saved',
-            'penalties_missed', 'yellow_cards', 'red_cards',
-            'saves', 'bonus', 'influence', 'creativity', 'threat'
-        ]]
-        X_scaled = SCALER.transform(X)
-        predictions = MODEL.predict(X_scaled)
-        DF['predicted_value'] = predictions
+        # Predictions are computed once, when the snapshot is built
+        snapshot = SNAPSHOT
+        
+        def build():
+            predicted = snapshot.column('predicted_value')
+            top_rows = np.argsort(-predicted, kind='stable')[:25]
+            top_players = snapshot.records(
+                top_rows, ['name', 'team', 'value_season', 'predicted_value'] + INTERVAL_COLUMNS
+            )
+            return {
+                "status": "success",
+                "top_players": top_players
+            }
+        
+        response = await cached_response(request, snapshot, ('top_players',), build, CACHED_LEVELS)
         
-        # Add print statement to verify number of players
-        top_players = DF.nlargest(25, 'predicted_value')[
-            ['name', 'team', 'value_season', 'predicted_value']
-        ]
-        print(f"Number of players being sent: {len(top_players)}")  # Debug line
+        if STARTUP_STATE["first_request_seconds"] is None:
+            STARTUP_STATE["first_request_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+        
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error: {str(e)}")  # Debug line
+        return {
+            "status": "error",
+            "error": str(e)
+        }
+
+@app.get("/api/players/search")
+async def search_players(request: Request, q: str, limit: int = 10):
+    """Accent-insensitive player search over name, web_name and team"""
+    if STARTUP_STATE["status"] != "ready":
+        return _not_ready_response()
+    
+    snapshot, index = current_search()
+    limit = max(1, min(limit, 50))
+    
+    def build():
+        # Skip any hit that is not in this snapshot
+        hits = []
+        rows = []
+        for hit in index.search(q, limit=limit):
+            row = snapshot.row_for_player(hit[0])
+            if row is not None:
+                hits.append(hit)
+                rows.append(row)
+        players = snapshot.records(
+            rows, ['player_id', 'name', 'web_name', 'team', 'position', 'now_cost', 'predicted_value']
+        )
+        for player, (_, score, match) in zip(players, hits):
+            player["score"] = round(score, 4)
+            player["match"] = match
+        return {
+            "status": "success",
+            "model_version": snapshot.version,
+            "players": players
+        }
+    
+    # Queries that normalize the same ("Ødegaard", "odegaard") share one entry
+    return await cached_response(request, snapshot, ('search', normalize(q), limit), build)
+
+@app.get("/api/players/{player_id}/explain")
+async def explain_player(request: Request, player_id: int):
+    """Per-feature SHAP contributions to a player's predicted value"""
+    if STARTUP_STATE["status"] != "ready":
+        return _not_ready_response()
+    
+    snapshot = SNAPSHOT
+    row = snapshot.row_for_player(player_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Player {player_id} not found")
+    
+    def build():
+        player = snapshot.records(
+            [row], ['player_id', 'name', 'team', 'value_season', 'predicted_value'] + INTERVAL_COLUMNS
+        )[0]
+        feature_values = [snapshot.column(feature)[row] for feature in snapshot.features]
+        explanation = explain_row(snapshot.contribs[row], snapshot.features, feature_values)
+        return {
+            "status": "success",
+            "model_version": snapshot.version,
+            **player,
+            **explanation
+        }
+    
+    return await cached_response(request, snapshot, ('explain', player_id), build)
+
+@app.get("/api/players/{player_id}/similar")
+async def similar_players(
+    request: Request,
+    player_id: int,
+    k: int = 10,
+    position: Optional[str] = None,
+    max_cost: Optional[float] = None
+):
+    """Players with the most similar stats, optionally filtered by position and max now_cost"""
+    if STARTUP_STATE["status"] != "ready":
+        return _not_ready_response()
+    
+    snapshot = SNAPSHOT
+    row = snapshot.row_for_player(player_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Player {player_id} not found")
+    
+    k = max(1, min(k, 50))
+    check_position(snapshot, position)
+    
+    def build():
+        global SIMILARITY
+        # Trees are built once per snapshot version
+        if SIMILARITY is None or SIMILARITY.version != snapshot.version:
+            from similarity import SimilarityEngine
+            SIMILARITY = SimilarityEngine(snapshot)
         
+        matches = SIMILARITY.similar(row, k=k, position=position, max_cost=max_cost)
+        columns = ['player_id', 'name', 'team', 'position', 'now_cost', 'value_season', 'predicted_value']
+        players = snapshot.records([match_row for match_row, _ in matches], columns)
+        for player, (_, distance) in zip(players, matches):
+            player["distance"] = round(distance, 4)
         return {
             "status": "success",
-            "top_players": top_players.to_dict(orient='records')
+            "model_version": snapshot.version,
+            "player": snapshot.records([row], columns)[0],
+            "similar_players": players
         }
+    
+    key = ('similar', player_id, k, position.upper() if position else None, max_cost)
+    return await cached_response(request, snapshot, key, build)
+
+@app.get("/api/feature-importance")
+async def get_feature_importance(request: Request):
+    """Global feature importance (mean absolute SHAP contribution)"""
+    if STARTUP_STATE["status"] != "ready":
+        return _not_ready_response()
+    
+    snapshot = SNAPSHOT
+    return await cached_response(request, snapshot, ('feature_importance',), lambda: {
+        "status": "success",
+        "model_version": snapshot.version,
+        "feature_importance": snapshot.feature_importance
+    }, CACHED_LEVELS)
+
+@app.get("/api/export/predictions")
+async def export_predictions(
+    request: Request,
+    format: str = "csv",
+    columns: Optional[str] = None,
+    team: Optional[str] = None,
+    position: Optional[str] = None,
+    min_predicted_value: Optional[float] = None,
+    max_now_cost: Optional[float] = None
+):
+    """
+    Stream predictions joined with player data for BI tools.
+    
+    format: csv, ndjson or arrow (Arrow IPC stream)
+    columns: comma-separated list of columns to include
+    """
+    if STARTUP_STATE["status"] != "ready":
+        return _not_ready_response()
+    
+    if format not in exports.EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{format}'. Use one of: {', '.join(exports.EXPORT_FORMATS)}"
+        )
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Arrow export requires pyarrow")
+    
+    snapshot = SNAPSHOT
+    available = snapshot.manifest["numeric_columns"] + snapshot.manifest["string_columns"]
+    selected = columns.split(',') if columns else exports.DEFAULT_EXPORT_COLUMNS
+    unknown = [col for col in selected if col not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    check_position(snapshot, position)
+    
+    rows = exports.filter_rows(snapshot, team, position, min_predicted_value, max_now_cost)
+    stream = exports.STREAMERS[format](snapshot, rows, selected)
+    headers = {
+        "Content-Disposition": f'attachment; filename="predictions-{snapshot.version}.{format}"',
+        "X-Model-Version": snapshot.version,
+        "Vary": "Accept-Encoding"
+    }
+    # Compressed chunk by chunk, so the export is still streamed
+    encoding = choose_encoding(request.headers.get('accept-encoding'))
+    if encoding:
+        stream = compress_stream(stream, encoding)
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(stream, media_type=exports.EXPORT_FORMATS[format], headers=headers)
+
+@app.get("/api/export/summary")
+async def export_summary(request: Request):
+    """Prediction summary statistics for the current model version"""
+    if STARTUP_STATE["status"] != "ready":
+        return _not_ready_response()
+    
+    snapshot = SNAPSHOT
+    return await cached_response(request, snapshot, ('summary',), lambda: {
+        "status": "success",
+        "model_version": snapshot.version,
+        "prediction_date": snapshot.manifest["created_at"],
+        **snapshot.summary
+    }, CACHED_LEVELS)
+
+def _read_latest_predictions(limit):
+    """Query the local read replica (blocking; runs in the thread pool)"""
+    global REPLICA
+    
+    if REPLICA is None:
+        from storage import get_replica
+        REPLICA = get_replica()
+    
+    df = REPLICA.latest_predictions(limit=limit)
+    df['prediction_date'] = df['prediction_date'].astype(str)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient='records')
+
+@app.get("/api/predictions/latest")
+async def get_latest_predictions(request: Request, limit: int = 25):
+    """Latest stored predictions, served from the local read replica instead of Neon"""
+    # Enough for every player in a batch
+    limit = max(1, min(limit, 1000))
+    try:
+        async with EXPENSIVE_READS.slot():
+            predictions = await run_in_threadpool(_read_latest_predictions, limit)
+        
+        # The replica changes independently of the snapshot, so this is encoded per request
+        return json_response(request, {
+            "status": "success",
+            "predictions": predictions
+        })
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error: {str(e)}")  # Debug line
         return {
             "status": "error",
             "error": str(e)
@@ -133,11 +493,58 @@ def verify_api_key(api_key: Optional[str] = Header(None, alias="X-API-Key")):
     
     return True
 
+def _run_etl_pipeline():
+    """Run the ETL and publish a new snapshot (blocking; runs in the thread pool)"""
+    from etl_pipeline import ETLPipeline
+    
+    print("🚀 ETL Pipeline triggered via API")
+    start_time = time.time()
+    pipeline = ETLPipeline()
+    pipeline.run()
+    
+    # The ETL downloaded fresh player data - publish a new snapshot for every worker
+    snapshot_version = snapshots.build_snapshot(download=False)
+    return {
+        "rows_processed": pipeline.rows_inserted,
+        "snapshot_version": snapshot_version,
+        "duration_seconds": int(time.time() - start_time)
+    }
+
+def _run_predictions_pipeline():
+    """Train, predict and store (blocking; runs in the thread pool)"""
+    from generate_predictions import main as run_predictions_main
+    
+    print("🚀 Predictions generation triggered via API")
+    run_predictions_main()
+    return {}
+
+def _run_maintenance_pipeline():
+    """Compact and expire prediction history (blocking; runs in the thread pool)"""
+    from maintenance import run_maintenance
+    
+    print("🚀 Database maintenance triggered via API")
+    return run_maintenance()
+
+async def run_pipeline(name, function):
+    """
+    Run a pipeline off the event loop. Concurrent calls for the same pipeline
+    share one run, also across workers; different pipelines run one at a time
+    per worker, and callers beyond the queue get 429. Returns (result, coalesced).
+    """
+    async def run():
+        async with PIPELINES.slot():
+            lock_path = os.path.join(PIPELINE_LOCK_DIR, f"{name}.lock")
+            return await run_in_threadpool(run_exclusive, lock_path, function)
+    
+    (result, shared_across_workers), shared = await PIPELINE_FLIGHTS.run(name, run)
+    return result, shared or shared_across_workers
+
 @app.post("/api/run-etl")
 async def run_etl(x_api_key: Optional[str] = Header(None, alias="X-API-Key")):
     """
     Run ETL pipeline via API endpoint.
-    Can be called by external cron services.
+    Can be called by external cron services. Concurrent calls join the run
+    already in progress instead of starting another.
     
     Optional: Set ETL_API_KEY environment variable for security.
     If set, include it in the request header: X-API-Key: your_key
@@ -146,20 +553,15 @@ async def run_etl(x_api_key: Optional[str] = Header(None, alias="X-API-Key")):
         # Verify API key if set
         verify_api_key(x_api_key)
         
-        # Import and run ETL pipeline
-        from etl_pipeline import ETLPipeline
-        
-        print("🚀 ETL Pipeline triggered via API")
-        start_time = time.time()
-        pipeline = ETLPipeline()
-        pipeline.run()
-        duration = int(time.time() - start_time)
+        result, coalesced = await run_pipeline("run-etl", _run_etl_pipeline)
+        # Pick up the new snapshot now, whichever worker published it
+        await run_in_threadpool(refresh_snapshot)
         
         return JSONResponse({
             "status": "success",
             "message": "ETL pipeline completed successfully",
-            "rows_processed": pipeline.rows_inserted,
-            "duration_seconds": duration
+            **result,
+            "coalesced": coalesced
         })
     except HTTPException:
         raise
@@ -180,7 +582,8 @@ async def run_etl(x_api_key: Optional[str] = Header(None, alias="X-API-Key")):
 async def run_predictions(x_api_key: Optional[str] = Header(None, alias="X-API-Key")):
     """
     Run predictions generation via API endpoint.
-    Can be called by external cron services.
+    Can be called by external cron services. Concurrent calls join the run
+    already in progress instead of starting another.
     
     Optional: Set ETL_API_KEY environment variable for security.
     If set, include it in the request header: X-API-Key: your_key
@@ -189,15 +592,12 @@ async def run_predictions(x_api_key: Optional[str] = Header(None, alias="X-API-K
         # Verify API key if set
         verify_api_key(x_api_key)
         
-        # Import and run predictions script
-        from generate_predictions import main as run_predictions_main
-        
-        print("🚀 Predictions generation triggered via API")
-        run_predictions_main()
+        _, coalesced = await run_pipeline("run-predictions", _run_predictions_pipeline)
         
         return JSONResponse({
             "status": "success",
-            "message": "Predictions generation completed successfully"
+            "message": "Predictions generation completed successfully",
+            "coalesced": coalesced
         })
     except HTTPException:
         raise
@@ -214,6 +614,42 @@ async def run_predictions(x_api_key: Optional[str] = Header(None, alias="X-API-K
             }
         )
 
+@app.post("/api/run-maintenance")
+async def run_maintenance_job(x_api_key: Optional[str] = Header(None, alias="X-API-Key")):
+    """
+    Compact old prediction batches and expire old history (see maintenance.py).
+    Called daily by the scheduled workflow; protected by ETL_API_KEY like the pipelines.
+    """
+    try:
+        # Verify API key if set
+        verify_api_key(x_api_key)
+        
+        report, coalesced = await run_pipeline("run-maintenance", _run_maintenance_pipeline)
+        
+        return JSONResponse({
+            "status": "success",
+            "message": "Database maintenance completed successfully",
+            **report,
+            "coalesced": coalesced
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Database maintenance error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return JSONResponse(
+            status_code=500,
+            content={
+                "status": "error",
+                "message": "Database maintenance failed",
+                "error": str(e)
+            }
+        )
+
+# Time spent importing this module (and FastAPI), reported by /readyz
+STARTUP_STATE["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+
 if __name__ == "__main__":
     import uvicorn
     # Use the environment variable PORT for binding the app to the correct port
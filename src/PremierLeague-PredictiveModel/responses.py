@@ -0,0 +1,198 @@
+"""
+Fast JSON Responses
+Read endpoints encode their payload with orjson instead of FastAPI's generic
+jsonable_encoder, and compress it with brotli or gzip when the client sends
+a matching Accept-Encoding. Payloads that depend only on the snapshot are
+cached per model version: each is encoded once, and each compressed variant
+is built on first request and reused until the next snapshot. Encoding and
+compression happen in PayloadCache.get, which the server calls from the
+thread pool, so a cold variant never blocks the event loop.
+"""
+
+import gzip
+import zlib
+import threading
+from collections import OrderedDict
+
+import orjson
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Smaller payloads are sent as-is: compressing them saves almost nothing
+MIN_COMPRESS_BYTES = 512
+
+# A handful of payloads depend only on the model version (top players, feature
+# importance, summary): they are compressed once, with the slowest, smallest
+# settings. Per-query payloads (search, explain, similar) and uncached ones
+# use cheaper settings - brotli 11 costs milliseconds per cold variant.
+CACHED_LEVELS = {'br': 11, 'gzip': 9}
+DYNAMIC_LEVELS = {'br': 5, 'gzip': 6}
+
+# Preferred encoding first
+ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+# Cached payloads kept per model version (least recently used are evicted)
+PAYLOAD_CACHE_ENTRIES = 4096
+
+def dumps(payload):
+    """Encode a payload as JSON bytes (numpy scalars and arrays included)"""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY, default=str)
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+def choose_encoding(accept_encoding):
+    """Best supported encoding allowed by an Accept-Encoding header, or None for identity"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+class EncodedPayload:
+    """A JSON body plus its compressed variants, built on first use"""
+
+    def __init__(self, body, levels=CACHED_LEVELS):
+        self.body = body
+        self.levels = levels
+        self.variants = {}
+
+    def has_variant(self, encoding):
+        """True if variant(encoding) can be served without compressing"""
+        return encoding is None or len(self.body) < MIN_COMPRESS_BYTES or encoding in self.variants
+
+    def variant(self, encoding):
+        if encoding is None or len(self.body) < MIN_COMPRESS_BYTES:
+            return None, self.body
+        data = self.variants.get(encoding)
+        if data is None:
+            # Two threads may race to build the same variant; both results are identical
+            data = compress(self.body, encoding, self.levels[encoding])
+            self.variants[encoding] = data
+        return encoding, data
+
+class _PendingBuild:
+    """A cache miss being built by one thread while others wait for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+class PayloadCache:
+    """
+    Encoded payloads for the current model version, keyed by endpoint and parameters.
+    Concurrent misses for the same key are coalesced: one thread builds the
+    payload and the others wait for its result.
+    """
+
+    def __init__(self, max_entries=PAYLOAD_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.version = None
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _switch_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def peek(self, version, key):
+        """The cached payload for key, or None on a miss"""
+        with self._lock:
+            self._switch_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, version, key, build, levels=CACHED_LEVELS, encoding=None):
+        """
+        Return the cached payload for key, calling build() to create it on a miss.
+        The variant for `encoding` is compressed here too, so the caller can serve it directly.
+        """
+        with self._lock:
+            self._switch_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                pending = self._building.get((version, key))
+                leader = pending is None
+                if leader:
+                    pending = self._building[(version, key)] = _PendingBuild()
+
+        if entry is not None:
+            entry.variant(encoding)
+            return entry
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            pending.entry.variant(encoding)
+            return pending.entry
+
+        try:
+            pending.entry = EncodedPayload(dumps(build()), levels)
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._building[(version, key)]
+                if pending.entry is not None and version == self.version:
+                    self._entries[key] = pending.entry
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            pending.done.set()
+        pending.entry.variant(encoding)
+        return pending.entry
+
+def respond(request, entry, status_code=200, headers=None):
+    """Send an EncodedPayload in the best encoding the client accepts"""
+    encoding, body = entry.variant(choose_encoding(request.headers.get('accept-encoding')))
+    headers = {'Vary': 'Accept-Encoding', **(headers or {})}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, status_code=status_code, media_type='application/json', headers=headers)
+
+def json_response(request, payload, status_code=200, headers=None):
+    """Encode and send a payload that is not worth caching"""
+    return respond(request, EncodedPayload(dumps(payload), DYNAMIC_LEVELS), status_code, headers)
+
+def compress_stream(chunks, encoding):
+    """Compress a stream of str/bytes chunks on the fly"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=DYNAMIC_LEVELS['br'])
+        compress_chunk, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(DYNAMIC_LEVELS['gzip'], zlib.DEFLATED, 31)  # 31: gzip container
+        compress_chunk, finish = compressor.compress, compressor.flush
+
+    for chunk in chunks:
+        data = compress_chunk(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield finish()
@@ -1,30 +1,63 @@
 import webbrowser
 import time
 import subprocess
+import json
+import urllib.request
+import urllib.error
+
+SERVER_URL = 'http://localhost:8000'
+READY_TIMEOUT_SECONDS = 600
+
+def wait_until_ready(server_process, url=SERVER_URL, timeout=READY_TIMEOUT_SECONDS):
+    """Poll /readyz until the model is loaded. Returns the readiness payload."""
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if server_process.poll() is not None:
+            raise RuntimeError("Server exited before becoming ready")
+        try:
+            with urllib.request.urlopen(f"{url}/readyz", timeout=2) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            # 503 while the model is loading
+            state = json.loads(e.read() or b'{}')
+            if state.get("status") == "failed":
+                raise RuntimeError(f"Model loading failed: {state.get('error')}")
+        except (urllib.error.URLError, ConnectionError):
+            # Server is not accepting connections yet
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"Server was not ready after {timeout} seconds")
 
 def main():
     # Start the FastAPI server
     print("Starting the Premier League Predictor...")
     print("This may take a few moments as the model loads...")
-    
+
+    start_time = time.time()
+
     # Start the server in a separate process
     server_process = subprocess.Popen(
         ["python", "premierleague_MLModel.py"],
         stdout=subprocess.PIPE
     )
-    
-    # Wait a few seconds for the server to start
-    time.sleep(5)
-    
-    # Open the browser
-    webbrowser.open('http://localhost:8000')
-    
+
     try:
+        # Wait for the model to finish loading
+        state = wait_until_ready(server_process)
+        print(f"Server ready in {time.time() - start_time:.2f} seconds "
+              f"(model source: {state.get('source')})")
+
+        # Open the browser
+        webbrowser.open(SERVER_URL)
+
         # Keep the script running
         server_process.wait()
     except KeyboardInterrupt:
         print("\nShutting down the server...")
         server_process.terminate()
+    except Exception:
+        server_process.terminate()
+        raise
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
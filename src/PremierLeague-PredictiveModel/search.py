@@ -0,0 +1,225 @@
+"""
+Player Search
+In-memory, accent-insensitive search over player name, web_name and team.
+Names are folded ("Fábio" -> "fabio") and indexed in a prefix trie for
+as-you-type matches, with a trigram index as a fuzzy fallback for typos.
+The index is updated incrementally when the published players change; the
+server updates a copy and swaps it in, so searches never see a half-updated index.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+
+# Relative weight of a match in each field
+FIELD_WEIGHTS = {
+    'web_name': 1.0,
+    'name': 0.9,
+    'team': 0.4,
+}
+
+# Fields that also feed the fuzzy trigram index
+FUZZY_FIELDS = ['web_name', 'name']
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy match
+FUZZY_THRESHOLD = 0.4
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+# Letters that Unicode does not decompose into a base letter plus an accent
+_TRANSLITERATIONS = str.maketrans({
+    'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'đ': 'd', 'ð': 'd', 'ł': 'l', 'ı': 'i', 'þ': 'th',
+})
+
+def normalize(text):
+    """Fold accents and case, and reduce punctuation to single spaces"""
+    decomposed = unicodedata.normalize('NFKD', (text or '').casefold().translate(_TRANSLITERATIONS))
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', stripped).strip()
+
+def trigrams(token):
+    """Character trigrams of a token, padded so short tokens still produce some"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _copy_trie(node):
+    return {ch: set(child) if ch == '' else _copy_trie(child) for ch, child in node.items()}
+
+class PlayerSearchIndex:
+    """Prefix trie plus trigram index, keyed by player_id"""
+
+    def __init__(self):
+        # Trie nodes are dicts of child characters; the '' key holds the
+        # ids of every player with a token passing through that node
+        self._trie = {'': set()}
+        # Fuzzy index: trigram -> words containing it, word -> players with that word
+        self._gram_words = defaultdict(set)
+        self._word_ids = defaultdict(set)
+        self._word_gram_counts = {}
+        self._docs = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def copy(self):
+        """Independent copy, to update while searches keep using this one"""
+        clone = PlayerSearchIndex()
+        clone._trie = _copy_trie(self._trie)
+        clone._gram_words = defaultdict(set, {gram: set(words) for gram, words in self._gram_words.items()})
+        clone._word_ids = defaultdict(set, {word: set(ids) for word, ids in self._word_ids.items()})
+        clone._word_gram_counts = dict(self._word_gram_counts)
+        # Documents are replaced on update, never modified, so they can be shared
+        clone._docs = dict(self._docs)
+        return clone
+
+    def _tokens(self, fields):
+        """Map each normalized token to its best field weight"""
+        tokens = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            text = normalize(fields.get(field, ''))
+            # Index each word and the whole field, so "de bruyne" matches as one phrase
+            for token in set(text.split()) | ({text.replace(' ', '')} if ' ' in text else set()):
+                tokens[token] = max(tokens.get(token, 0), weight)
+        return tokens
+
+    def add(self, player_id, fields):
+        """Index a player. fields maps 'name', 'web_name' and 'team' to text."""
+        if player_id in self._docs:
+            self.remove(player_id)
+
+        tokens = self._tokens(fields)
+        words = set()
+        for field in FUZZY_FIELDS:
+            words.update(normalize(fields.get(field, '')).split())
+
+        for token in tokens:
+            node = self._trie
+            for ch in token:
+                node = node.setdefault(ch, {'': set()})
+                node[''].add(player_id)
+        for word in words:
+            if word not in self._word_ids:
+                grams = trigrams(word)
+                for gram in grams:
+                    self._gram_words[gram].add(word)
+                self._word_gram_counts[word] = len(grams)
+            self._word_ids[word].add(player_id)
+
+        self._docs[player_id] = {"fields": dict(fields), "tokens": tokens, "words": words}
+
+    def remove(self, player_id):
+        """Remove a player from the index"""
+        doc = self._docs.pop(player_id, None)
+        if doc is None:
+            return
+        for token in doc["tokens"]:
+            node = self._trie
+            for ch in token:
+                node = node.get(ch)
+                if node is None:
+                    break
+                node[''].discard(player_id)
+        for word in doc["words"]:
+            ids = self._word_ids[word]
+            ids.discard(player_id)
+            if not ids:
+                # Last player with this word: drop it from the trigram index too
+                del self._word_ids[word]
+                del self._word_gram_counts[word]
+                for gram in trigrams(word):
+                    self._gram_words[gram].discard(word)
+                    if not self._gram_words[gram]:
+                        del self._gram_words[gram]
+
+    def update(self, players):
+        """
+        Bring the index in line with {player_id: fields}, touching only players
+        that were added, removed or changed. Returns (added, changed, removed).
+        """
+        removed = [pid for pid in self._docs if pid not in players]
+        for pid in removed:
+            self.remove(pid)
+
+        added = changed = 0
+        for pid, fields in players.items():
+            doc = self._docs.get(pid)
+            if doc is None:
+                added += 1
+            elif doc["fields"] != fields:
+                changed += 1
+            else:
+                continue
+            self.add(pid, fields)
+        return added, changed, len(removed)
+
+    def _prefix_ids(self, prefix):
+        node = self._trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        return node['']
+
+    def search(self, query, limit=10):
+        """
+        Return up to `limit` hits as (player_id, score, match) tuples, best first.
+        Every query word must prefix-match some word of the player; if that
+        finds too few players, trigram similarity fills in the rest.
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+
+        # Prefix matches: intersect the candidate sets of each query word
+        candidates = None
+        for word in sorted(words, key=len, reverse=True):
+            ids = self._prefix_ids(word)
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                break
+
+        hits = {}
+        for pid in candidates or ():
+            tokens = self._docs[pid]["tokens"]
+            score = 0.0
+            for word in words:
+                best = 0.0
+                for token, weight in tokens.items():
+                    if token == word:
+                        best = max(best, 2.0 * weight)
+                    elif token.startswith(word):
+                        # Longer prefixes of a token are better matches
+                        best = max(best, (1.0 + len(word) / len(token)) * weight)
+                score += best
+            hits[pid] = (score / len(words) + 1.0, "prefix")
+
+        # Fuzzy matches for typos ("salha" -> "salah"), scored below any prefix match
+        if len(hits) < limit:
+            totals = defaultdict(float)
+            for word in words:
+                word_grams = trigrams(word)
+                shared = defaultdict(int)
+                for gram in word_grams:
+                    for indexed_word in self._gram_words.get(gram, ()):
+                        shared[indexed_word] += 1
+
+                # Best similarity of this query word against each player's words
+                best = {}
+                for indexed_word, count in shared.items():
+                    similarity = 2 * count / (len(word_grams) + self._word_gram_counts[indexed_word])
+                    if similarity < FUZZY_THRESHOLD:
+                        continue
+                    for pid in self._word_ids[indexed_word]:
+                        best[pid] = max(best.get(pid, 0.0), similarity)
+                # Weight by word length so a matching "de" cannot carry "de bruyne"
+                for pid, similarity in best.items():
+                    totals[pid] += similarity * len(word)
+
+            query_length = sum(len(word) for word in words)
+            for pid, total in totals.items():
+                similarity = total / query_length
+                if pid not in hits and similarity >= FUZZY_THRESHOLD:
+                    hits[pid] = (similarity, "fuzzy")
+
+        ranked = sorted(hits.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return [(pid, score, match) for pid, (score, match) in ranked]
@@ -0,0 +1,56 @@
+"""
+Similar Players
+Nearest-neighbour search over the model's standardized feature vectors
+(minutes, goals, assists, ICT components, ...), answering questions like
+"players like X but cheaper". KD-trees are built once per snapshot: one over
+every player and one per position, so position filters never scan the
+whole table.
+"""
+
+import numpy as np
+
+class SimilarityEngine:
+    """KD-trees over a snapshot's standardized features"""
+
+    def __init__(self, snapshot):
+        from sklearn.neighbors import KDTree
+
+        self.version = snapshot.version
+        self.features = np.ascontiguousarray(snapshot.feature_matrix())
+        self.positions = np.asarray(snapshot.column('position'))
+        self.costs = np.asarray(snapshot.column('now_cost'))
+
+        # Each entry maps a position (None = all) to (tree, snapshot rows in the tree)
+        self._trees = {None: (KDTree(self.features), np.arange(len(self.features)))}
+        for position in np.unique(self.positions):
+            rows = np.flatnonzero(self.positions == position)
+            self._trees[str(position)] = (KDTree(self.features[rows]), rows)
+
+    def similar(self, row, k=10, position=None, max_cost=None):
+        """
+        Return up to k (row, distance) pairs closest to the player at `row`,
+        excluding the player itself. A cost filter is applied to the nearest
+        candidates, widening the search only when too many are filtered out.
+        """
+        position = position.upper() if position else None
+        if position not in self._trees:
+            return []
+        tree, tree_rows = self._trees[position]
+
+        query = self.features[row:row + 1]
+        n_candidates = min(len(tree_rows), k + 1)
+        while True:
+            distances, indices = tree.query(query, k=n_candidates)
+            results = []
+            for distance, index in zip(distances[0], indices[0]):
+                candidate = int(tree_rows[index])
+                if candidate == row:
+                    continue
+                if max_cost is not None and not self.costs[candidate] <= max_cost:
+                    continue
+                results.append((candidate, float(distance)))
+                if len(results) == k:
+                    return results
+            if n_candidates == len(tree_rows):
+                return results
+            n_candidates = min(len(tree_rows), n_candidates * 2)
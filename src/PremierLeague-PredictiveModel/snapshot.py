@@ -0,0 +1,325 @@
+"""
+Prediction Snapshot
+Builds the model and the scored player table once and publishes them as
+read-only files that every API worker memory-maps instead of retraining.
+
+Layout (one directory per model version):
+    data/snapshots/<version>/manifest.json   metadata and scaler parameters
+    data/snapshots/<version>/numeric.npy     column-major float64 matrix (mmap'd)
+    data/snapshots/<version>/strings.json    text columns (name, team, ...)
+    data/snapshots/<version>/contribs.npy    per-player SHAP contributions (mmap'd)
+    data/snapshots/<version>/model.ubj       XGBoost booster
+    data/snapshots/CURRENT                   name of the published version
+
+Run `python snapshot.py` to build and publish a snapshot ahead of time. It only
+helps when the web processes can see SNAPSHOT_DIR (same machine or a shared
+volume); otherwise the first worker to start builds it.
+"""
+
+import os
+import json
+import time
+import shutil
+import fcntl
+from datetime import datetime
+
+import numpy as np
+
+from explain import compute_contributions, global_importance
+from exports import summarize_predictions
+from intervals import IntervalModel, INTERVAL_QUANTILES, INTERVAL_COLUMNS
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./data/snapshots")
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv("SNAPSHOT_MAX_AGE_HOURS", "24"))
+SNAPSHOTS_TO_KEEP = 3
+
+# Features used to train the model
+FEATURES = [
+    'minutes', 'goals_scored', 'assists', 'clean_sheets',
+    'goals_conceded', 'own_goals', 'penalties_saved',
+    'penalties_missed', 'yellow_cards', 'red_cards',
+    'saves', 'bonus', 'influence', 'creativity', 'threat'
+]
+
+# Columns published with every snapshot
+NUMERIC_COLUMNS = ['player_id', 'now_cost', 'value_season', 'predicted_value'] + INTERVAL_COLUMNS + FEATURES
+STRING_COLUMNS = ['name', 'web_name', 'team', 'position', 'status']
+
+def download_dataset():
+    if os.getenv("FPL_OFFLINE"):
+        print("⚠️  Offline mode: using existing ./data/players.csv")
+        return
+
+    import kaggle
+
+    dataset_name = 'meraxes10/fantasy-premier-league-dataset-2025-2026'
+    download_path = './data/'
+    os.makedirs(download_path, exist_ok=True)
+    os.environ["KAGGLE_USERNAME"] = os.getenv("KAGGLE_USERNAME")
+    os.environ["KAGGLE_KEY"] = os.getenv("KAGGLE_KEY")
+    kaggle.api.authenticate()
+    kaggle.api.dataset_download_files(dataset_name, path=download_path, unzip=True)
+    print("Dataset downloaded successfully!")
+
+def train_model(df):
+    """Train the model and score every player"""
+    from sklearn.preprocessing import StandardScaler
+    import xgboost as xgb
+
+    # Clean the data
+    df = df.dropna(subset=FEATURES + ['value_season'])
+    X = df[FEATURES]
+    y = df['value_season']
+
+    # Train the model
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # Initialize and train XGBoost model
+    model = xgb.XGBRegressor(
+        n_estimators=100,
+        learning_rate=0.1,
+        max_depth=5,
+        random_state=42,
+        n_jobs=-1
+    )
+    model.fit(X_scaled, y)
+
+    # Predictions only change when the model does, so compute them once here
+    df = df.copy()
+    df['predicted_value'] = model.predict(X_scaled).astype(float)
+    interval_model = IntervalModel.fit(X_scaled, y)
+    for col, values in zip(INTERVAL_COLUMNS, interval_model.predict(X_scaled, df['predicted_value'])):
+        df[col] = values
+
+    return model, scaler, df
+
+class Snapshot:
+    """A published snapshot. Numeric columns are memory-mapped, not copied."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, "strings.json")) as f:
+            self.strings = json.load(f)
+
+        # Read-only memory map: pages are shared between all worker processes
+        self.numeric = np.load(os.path.join(path, "numeric.npy"), mmap_mode='r')
+        self.contribs = np.load(os.path.join(path, "contribs.npy"), mmap_mode='r')
+        self._column_index = {col: i for i, col in enumerate(self.manifest["numeric_columns"])}
+        self._row_by_player = None
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    @property
+    def features(self):
+        return self.manifest["features"]
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    def column(self, name):
+        """Return a column: a zero-copy array view for numeric columns, a list for text"""
+        if name in self._column_index:
+            return self.numeric[:, self._column_index[name]]
+        return self.strings[name]
+
+    def row_for_player(self, player_id):
+        """Return the row index for a player, or None if the player is not in the snapshot"""
+        if self._row_by_player is None:
+            self._row_by_player = {
+                int(pid): row for row, pid in enumerate(self.column('player_id'))
+            }
+        return self._row_by_player.get(int(player_id))
+
+    @property
+    def summary(self):
+        """Prediction summary statistics, computed when the snapshot was published"""
+        return self.manifest["summary"]
+
+    @property
+    def feature_importance(self):
+        """Global SHAP importance, computed when the snapshot was published"""
+        return self.manifest["feature_importance"]
+
+    def records(self, rows, columns):
+        """Build JSON-ready records for the given row indices"""
+        data = {col: self.column(col) for col in columns}
+        records = []
+        for row in rows:
+            record = {}
+            for col in columns:
+                value = data[col][row]
+                if col in self._column_index:
+                    value = float(value)
+                    if col == 'player_id':
+                        value = int(value)
+                    elif value != value:  # NaN is not valid JSON
+                        value = None
+                record[col] = value
+            records.append(record)
+        return records
+
+    def feature_matrix(self):
+        """Standardized feature matrix, as seen by the model"""
+        X = np.column_stack([self.column(f) for f in self.features])
+        scaler = self.manifest["scaler"]
+        return (X - np.asarray(scaler["mean"])) / np.asarray(scaler["scale"])
+
+def publish_snapshot(model, scaler, df, snapshot_dir=SNAPSHOT_DIR):
+    """Write a snapshot for a trained model and its scored players. Returns the version."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    tmp_path = os.path.join(snapshot_dir, f".{version}.tmp")
+    os.makedirs(tmp_path)
+
+    # Numeric columns as one column-major matrix so each column is contiguous
+    numeric = np.asfortranarray(np.column_stack([
+        df[col].astype(float).to_numpy() if col in df.columns else np.full(len(df), np.nan)
+        for col in NUMERIC_COLUMNS
+    ]))
+    np.save(os.path.join(tmp_path, "numeric.npy"), numeric)
+
+    strings = {
+        col: (df[col].fillna('').astype(str).tolist() if col in df.columns else [''] * len(df))
+        for col in STRING_COLUMNS
+    }
+    with open(os.path.join(tmp_path, "strings.json"), 'w') as f:
+        json.dump(strings, f)
+
+    model.save_model(os.path.join(tmp_path, "model.ubj"))
+
+    # Explanations for every player in one batched TreeSHAP pass
+    X_scaled = scaler.transform(df[FEATURES])
+    contribs = compute_contributions(model, X_scaled)
+    np.save(os.path.join(tmp_path, "contribs.npy"), contribs)
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.now().isoformat(),
+        "rows": len(df),
+        "features": FEATURES,
+        "numeric_columns": NUMERIC_COLUMNS,
+        "string_columns": STRING_COLUMNS,
+        "interval_quantiles": INTERVAL_QUANTILES,
+        "scaler": {
+            "mean": scaler.mean_.tolist(),
+            "scale": scaler.scale_.tolist()
+        },
+        "feature_importance": global_importance(contribs, FEATURES),
+        "summary": summarize_predictions(
+            numeric[:, NUMERIC_COLUMNS.index('predicted_value')],
+            numeric[:, NUMERIC_COLUMNS.index('value_season')],
+            strings['name']
+        )
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Publish atomically: readers only ever see complete snapshots
+    os.rename(tmp_path, os.path.join(snapshot_dir, version))
+    current_tmp = os.path.join(snapshot_dir, "CURRENT.tmp")
+    with open(current_tmp, 'w') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(snapshot_dir, "CURRENT"))
+
+    _remove_old_snapshots(snapshot_dir)
+    print(f"✅ Published snapshot {version} ({len(df)} players)")
+    return version
+
+def _remove_old_snapshots(snapshot_dir):
+    """Keep only the most recent snapshots. Workers still mapping old files keep their pages."""
+    versions = sorted(
+        name for name in os.listdir(snapshot_dir)
+        if not name.startswith('.') and os.path.isdir(os.path.join(snapshot_dir, name))
+    )
+    for name in versions[:-SNAPSHOTS_TO_KEEP]:
+        shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+def current_version(snapshot_dir=SNAPSHOT_DIR):
+    """Return the published version name, or None if nothing has been published"""
+    try:
+        with open(os.path.join(snapshot_dir, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR, max_age_hours=None):
+    """Map the published snapshot, or return None if it is missing or stale"""
+    version = current_version(snapshot_dir)
+    if version is None:
+        return None
+
+    path = os.path.join(snapshot_dir, version)
+    if max_age_hours is not None:
+        age_hours = (time.time() - os.path.getmtime(path)) / 3600
+        if age_hours > max_age_hours:
+            print(f"⚠️  Snapshot {version} is {age_hours:.1f} hours old")
+            return None
+
+    try:
+        snapshot = Snapshot(path)
+    except FileNotFoundError as e:
+        # Published by an older version of this module
+        print(f"⚠️  Snapshot {version} is incomplete: {str(e)}")
+        return None
+    if snapshot.features != FEATURES:
+        print(f"⚠️  Snapshot {version} was trained on different features")
+        return None
+    if set(NUMERIC_COLUMNS) - set(snapshot.manifest["numeric_columns"]):
+        print(f"⚠️  Snapshot {version} is missing published columns")
+        return None
+    return snapshot
+
+def build_snapshot(download=True, snapshot_dir=SNAPSHOT_DIR):
+    """Download the dataset, train the model and publish a new snapshot"""
+    import pandas as pd
+
+    if download:
+        download_dataset()
+    df = pd.read_csv('./data/players.csv')
+    # Rename 'id' to 'player_id' for consistency with the database
+    df = df.rename(columns={'id': 'player_id'})
+    # Serve only rows that pass the same checks as the ETL load
+    from validation import validate
+    df, quarantined, report = validate(df)
+    if len(quarantined):
+        print(f"⚠️  Left {len(quarantined)} invalid rows out of the snapshot: {report['failed_checks']}")
+    model, scaler, df = train_model(df)
+    return publish_snapshot(model, scaler, df, snapshot_dir)
+
+def ensure_snapshot(snapshot_dir=SNAPSHOT_DIR, max_age_hours=SNAPSHOT_MAX_AGE_HOURS):
+    """
+    Return a fresh snapshot, building one if needed. When several workers start
+    at once, a file lock makes sure only one of them downloads and trains.
+    Returns (snapshot, built) where built is True if this process trained it.
+    """
+    snapshot = load_snapshot(snapshot_dir, max_age_hours)
+    if snapshot is not None:
+        return snapshot, False
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, ".build.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Another worker may have published while we waited for the lock
+            snapshot = load_snapshot(snapshot_dir, max_age_hours)
+            if snapshot is not None:
+                return snapshot, False
+            build_snapshot(snapshot_dir=snapshot_dir)
+            return load_snapshot(snapshot_dir), True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def main():
+    """Build and publish a snapshot"""
+    print("🚀 Building prediction snapshot...")
+    start_time = time.time()
+    version = build_snapshot()
+    print(f"✅ Snapshot {version} built in {time.time() - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    main()
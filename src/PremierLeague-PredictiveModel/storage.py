@@ -0,0 +1,606 @@
+"""
+Storage Backends
+One interface over the two databases the pipeline can use:
+1. PostgresStorage - the Neon PostgreSQL database (when DATABASE_URL is set)
+2. SQLiteStorage   - an embedded SQLite file, used as the offline stand-in for
+                     Postgres and as the API's local read replica
+
+Every method opens its own connection and runs in one transaction.
+"""
+
+import os
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+import pandas as pd
+
+SQLITE_DATABASE_PATH = os.getenv("SQLITE_DATABASE_PATH", "./data/fpl_local.db")
+
+# Columns of the players table (see database_schema.sql)
+PLAYER_COLUMNS = [
+    'player_id', 'name', 'web_name', 'team', 'position', 'now_cost', 'value_season',
+    'total_points', 'points_per_game', 'selected_by_percent', 'form', 'minutes',
+    'goals_scored', 'assists', 'clean_sheets', 'goals_conceded', 'yellow_cards',
+    'red_cards', 'saves', 'bonus', 'influence', 'creativity', 'threat', 'ict_index',
+    'starts', 'expected_goals', 'expected_assists', 'expected_goal_involvements',
+    'status', 'news'
+]
+
+PREDICTION_COLUMNS = [
+    'player_id', 'name', 'team', 'position',
+    'value_season', 'predicted_value', 'prediction_lower', 'prediction_upper',
+    'confidence_score', 'model_version', 'prediction_date'
+]
+
+# Per-player values stored with every prediction (interval columns may be missing)
+PREDICTION_VALUE_COLUMNS = [
+    'player_id', 'predicted_value', 'prediction_lower', 'prediction_upper', 'confidence_score'
+]
+
+# Tables partitioned by month in Postgres, with their partition (date) column
+PARTITIONED_TABLES = {
+    'predictions': 'prediction_date',
+    'player_history': 'snapshot_date',
+}
+
+# SQLite version of database_schema.sql (SQLite has no partitioning, so
+# maintenance there uses indexed range deletes instead of dropping partitions)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_id INTEGER PRIMARY KEY,
+    name TEXT,
+    web_name TEXT,
+    team TEXT,
+    position TEXT,
+    now_cost REAL,
+    value_season REAL,
+    total_points INTEGER,
+    points_per_game REAL,
+    selected_by_percent REAL,
+    form REAL,
+    minutes INTEGER,
+    goals_scored INTEGER,
+    assists INTEGER,
+    clean_sheets INTEGER,
+    goals_conceded INTEGER,
+    yellow_cards INTEGER,
+    red_cards INTEGER,
+    saves INTEGER,
+    bonus INTEGER,
+    influence REAL,
+    creativity REAL,
+    threat REAL,
+    ict_index REAL,
+    starts INTEGER,
+    expected_goals REAL,
+    expected_assists REAL,
+    expected_goal_involvements REAL,
+    status TEXT,
+    news TEXT,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS player_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id INTEGER REFERENCES players(player_id) ON DELETE CASCADE,
+    name TEXT,
+    team TEXT,
+    position TEXT,
+    value_season REAL,
+    total_points INTEGER,
+    goals_scored INTEGER,
+    assists INTEGER,
+    minutes INTEGER,
+    snapshot_date DATE DEFAULT CURRENT_DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id INTEGER REFERENCES players(player_id) ON DELETE CASCADE,
+    predicted_value REAL,
+    model_version TEXT,
+    prediction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    confidence_score REAL,
+    prediction_lower REAL,
+    prediction_upper REAL
+);
+
+CREATE TABLE IF NOT EXISTS prediction_summaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_version TEXT,
+    prediction_date TIMESTAMP,
+    players INTEGER,
+    avg_predicted_value REAL,
+    min_predicted_value REAL,
+    max_predicted_value REAL,
+    compacted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (model_version, prediction_date)
+);
+
+CREATE TABLE IF NOT EXISTS feature_importance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_version TEXT,
+    feature_name TEXT,
+    importance_score REAL,
+    mean_contribution REAL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS data_updates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    update_type TEXT,
+    rows_inserted INTEGER,
+    rows_updated INTEGER,
+    status TEXT,
+    error_message TEXT,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    duration_seconds INTEGER,
+    run_id TEXT,
+    stages TEXT
+);
+
+CREATE TABLE IF NOT EXISTS players_quarantine (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    player_id INTEGER,
+    reasons TEXT,
+    row_data TEXT,
+    quarantined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_players_team ON players(team);
+CREATE INDEX IF NOT EXISTS idx_players_position ON players(position);
+CREATE INDEX IF NOT EXISTS idx_players_value_season ON players(value_season DESC);
+CREATE INDEX IF NOT EXISTS idx_players_total_points ON players(total_points DESC);
+CREATE INDEX IF NOT EXISTS idx_player_history_player_id ON player_history(player_id);
+CREATE INDEX IF NOT EXISTS idx_player_history_snapshot_date ON player_history(snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_predictions_player_id ON predictions(player_id);
+CREATE INDEX IF NOT EXISTS idx_predictions_prediction_date ON predictions(prediction_date);
+CREATE INDEX IF NOT EXISTS idx_predictions_player_date ON predictions(player_id, prediction_date);
+CREATE INDEX IF NOT EXISTS idx_predictions_model_version ON predictions(model_version);
+CREATE INDEX IF NOT EXISTS idx_predictions_model_version_date ON predictions(model_version, prediction_date);
+CREATE INDEX IF NOT EXISTS idx_feature_importance_model_version ON feature_importance(model_version);
+CREATE INDEX IF NOT EXISTS idx_data_updates_completed_at ON data_updates(completed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_players_quarantine_run_id ON players_quarantine(run_id);
+"""
+
+# Columns added after a table was first created: (table, column, type)
+SQLITE_MIGRATIONS = [
+    ('data_updates', 'run_id', 'TEXT'),
+    ('data_updates', 'stages', 'TEXT'),
+    ('predictions', 'prediction_lower', 'REAL'),
+    ('predictions', 'prediction_upper', 'REAL'),
+]
+
+def _plain(value):
+    """Convert values the database drivers cannot bind (Decimal, pandas Timestamp)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def _before_latest_batch(table):
+    """SQL condition: a predictions row is older than its model version's latest batch"""
+    return f"""{table}.prediction_date < (
+        SELECT MAX(latest.prediction_date) FROM predictions latest
+        WHERE latest.model_version = {table}.model_version
+    )"""
+
+def partition_name(table, month):
+    """Name of the monthly partition of `table` holding `month`, e.g. predictions_p2025_09"""
+    return f"{table}_p{month:%Y_%m}"
+
+def _archive(df, archive_dir, name):
+    """Write rows about to be dropped to <archive_dir>/<name>.parquet"""
+    if df.empty:
+        return None
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.parquet")
+    df.to_parquet(path, index=False)
+    return path
+
+def _rows(df, columns):
+    """Convert DataFrame rows to tuples of plain Python values (NaN becomes None)"""
+    values = df[columns].astype(object)
+    values = values.where(values.notna(), None).values.tolist()
+    return [tuple(_plain(value) for value in row) for row in values]
+
+class Storage:
+    """Queries shared by every backend. Subclasses provide connect() and placeholder."""
+
+    name = None
+    placeholder = '%s'
+
+    def connect(self):
+        raise NotImplementedError
+
+    def _timestamp(self, value):
+        return value
+
+    def _read(self, query, params=None):
+        conn = self.connect()
+        try:
+            return pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+
+    def _executemany(self, statements):
+        """Run (query, rows) pairs with executemany inside a single transaction"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            counts = []
+            for query, rows in statements:
+                if rows is None:
+                    cursor.execute(query)
+                elif isinstance(rows, list):
+                    if not rows:
+                        counts.append(0)
+                        continue
+                    cursor.executemany(query, rows)
+                else:
+                    cursor.execute(query, rows)
+                counts.append(cursor.rowcount)
+            conn.commit()
+            return counts
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def load_players(self, columns=None, only_with_minutes=False):
+        """Load player data"""
+        columns = columns or PLAYER_COLUMNS
+        query = f"SELECT {', '.join(columns)} FROM players"
+        if only_with_minutes:
+            query += " WHERE minutes IS NOT NULL"
+        return self._read(query)
+
+    def upsert_players(self, df):
+        """Insert or update players (keyed by player_id). Returns the number of rows written."""
+        columns = [col for col in df.columns if col in PLAYER_COLUMNS]
+        p = self.placeholder
+        placeholders = ', '.join([p] * len(columns))
+        update_clause = ', '.join([f"{col} = EXCLUDED.{col}" for col in columns if col != 'player_id'])
+
+        query = f"""
+            INSERT INTO players ({', '.join(columns)}, last_updated)
+            VALUES ({placeholders}, CURRENT_TIMESTAMP)
+            ON CONFLICT (player_id)
+            DO UPDATE SET {update_clause}, last_updated = CURRENT_TIMESTAMP
+        """
+        self._executemany([(query, _rows(df, columns))])
+        return len(df)
+
+    def store_predictions(self, df_predictions, model_version="v1.0", prediction_date=None):
+        """
+        Append a batch of predictions. Every row of a batch shares one prediction_date;
+        older batches are kept until maintenance.py compacts or expires them.
+        """
+        p = self.placeholder
+        prediction_date = self._timestamp(prediction_date or datetime.now())
+        values = df_predictions.reindex(columns=PREDICTION_VALUE_COLUMNS)
+        rows = [row + (model_version, prediction_date) for row in _rows(values, PREDICTION_VALUE_COLUMNS)]
+        self._executemany([
+            (f"""
+                INSERT INTO predictions
+                ({', '.join(PREDICTION_VALUE_COLUMNS)}, model_version, prediction_date)
+                VALUES ({', '.join([p] * (len(PREDICTION_VALUE_COLUMNS) + 2))})
+            """, rows),
+        ])
+        return len(rows)
+
+    def store_feature_importance(self, importance, model_version="v1.0"):
+        """Store global feature importance, replacing any for the same model version"""
+        p = self.placeholder
+        rows = [
+            (model_version, item['feature'], item['importance_score'], item['mean_contribution'])
+            for item in importance
+        ]
+        self._executemany([
+            (f"DELETE FROM feature_importance WHERE model_version = {p}", (model_version,)),
+            (f"""
+                INSERT INTO feature_importance (model_version, feature_name, importance_score, mean_contribution)
+                VALUES ({p}, {p}, {p}, {p})
+            """, rows),
+        ])
+        return len(rows)
+
+    def latest_predictions(self, limit=None):
+        """
+        The most recent prediction batch, joined with player data, best first.
+        Both lookups go through the prediction_date index, so the cost depends
+        on the batch size, not on how much history the table holds.
+        """
+        query = """
+            WITH latest_batch AS (
+                SELECT MAX(prediction_date) as latest_date
+                FROM predictions
+            )
+            SELECT
+                p.player_id,
+                p.name,
+                p.team,
+                p.position,
+                p.value_season,
+                pred.predicted_value,
+                pred.prediction_lower,
+                pred.prediction_upper,
+                pred.confidence_score,
+                pred.model_version,
+                pred.prediction_date
+            FROM predictions pred
+            JOIN players p ON pred.player_id = p.player_id
+            JOIN latest_batch lb ON pred.prediction_date = lb.latest_date
+            ORDER BY pred.predicted_value DESC
+        """
+        params = None
+        if limit is not None:
+            query += f" LIMIT {self.placeholder}"
+            params = (limit,)
+        df = self._read(query, params)
+        df['prediction_date'] = pd.to_datetime(df['prediction_date'])
+        return df
+
+    def replace_latest_predictions(self, df_predictions):
+        """Replace all predictions with the given batch (used to sync a read replica)"""
+        p = self.placeholder
+        columns = PREDICTION_VALUE_COLUMNS + ['model_version', 'prediction_date']
+        rows = [
+            row[:-1] + (self._timestamp(row[-1]),)
+            for row in _rows(df_predictions.reindex(columns=columns), columns)
+        ]
+        self._executemany([
+            ("DELETE FROM predictions", None),
+            (f"""
+                INSERT INTO predictions ({', '.join(columns)})
+                VALUES ({', '.join([p] * len(columns))})
+            """, rows),
+        ])
+        return len(rows)
+
+    def ensure_partitions(self, months_ahead=2, now=None):
+        """Create upcoming monthly partitions. Returns the names created (none without partitioning)."""
+        return []
+
+    def compact_predictions(self, before):
+        """
+        Replace prediction batches older than `before` with one summary row per
+        model version and batch. The latest batch of every model version is
+        always kept in full. Returns (batches summarized, rows deleted).
+        """
+        p = self.placeholder
+        before = self._timestamp(before)
+        old_batches = f"prediction_date < {p} AND {_before_latest_batch('predictions')}"
+        summarized, deleted = self._executemany([
+            (f"""
+                INSERT INTO prediction_summaries
+                (model_version, prediction_date, players, avg_predicted_value,
+                 min_predicted_value, max_predicted_value)
+                SELECT model_version, prediction_date, COUNT(*), AVG(predicted_value),
+                       MIN(predicted_value), MAX(predicted_value)
+                FROM predictions
+                WHERE {old_batches}
+                GROUP BY model_version, prediction_date
+                ON CONFLICT (model_version, prediction_date) DO NOTHING
+            """, (before,)),
+            (f"DELETE FROM predictions WHERE {old_batches}", (before,)),
+        ])
+        return summarized, deleted
+
+    def expire_rows(self, table, before, archive_dir=None):
+        """
+        Delete rows of a partitioned table dated before `before`, first writing
+        them to Parquet under archive_dir if given. Like compaction, this never
+        removes the latest prediction batch of a model version. Returns the number of rows removed.
+        """
+        p = self.placeholder
+        date_column = PARTITIONED_TABLES[table]
+        before = self._timestamp(before.date() if date_column == 'snapshot_date' else before)
+        expired = f"{date_column} < {p}"
+        if table == 'predictions':
+            expired += f" AND {_before_latest_batch(table)}"
+        if archive_dir:
+            df = self._read(f"SELECT * FROM {table} WHERE {expired}", (before,))
+            _archive(df, archive_dir, f"{table}_before_{str(before)[:10]}_{datetime.now():%Y%m%d%H%M%S}")
+        deleted, = self._executemany([
+            (f"DELETE FROM {table} WHERE {expired}", (before,)),
+        ])
+        return deleted
+
+    def quarantine_players(self, df_quarantined, run_id):
+        """Store rows that failed validation, replacing any already stored for this run"""
+        p = self.placeholder
+        # One JSON document per row, encoded in a single vectorized call
+        row_data = df_quarantined.drop(columns=['reasons']).to_json(orient='records', lines=True).splitlines()
+        player_ids = pd.to_numeric(df_quarantined['player_id'], errors='coerce')
+        rows = [
+            (run_id, None if pd.isna(player_id) else int(player_id), reasons, data)
+            for player_id, reasons, data in zip(player_ids, df_quarantined['reasons'], row_data)
+        ]
+        self._executemany([
+            (f"DELETE FROM players_quarantine WHERE run_id = {p}", (run_id,)),
+            (f"""
+                INSERT INTO players_quarantine (run_id, player_id, reasons, row_data)
+                VALUES ({p}, {p}, {p}, {p})
+            """, rows),
+        ])
+        return len(rows)
+
+    def log_update(self, update_type, rows_inserted, rows_updated, status,
+                   error_message, started_at, completed_at, duration_seconds,
+                   run_id=None, stages=None):
+        """Record an ETL run in data_updates (stages: JSON of each stage's result)"""
+        p = self.placeholder
+        query = f"""
+            INSERT INTO data_updates
+            (update_type, rows_inserted, rows_updated, status, error_message, started_at, completed_at,
+             duration_seconds, run_id, stages)
+            VALUES ({', '.join([p] * 10)})
+        """
+        self._executemany([(query, (
+            update_type, rows_inserted, rows_updated, status, error_message,
+            self._timestamp(started_at), self._timestamp(completed_at), duration_seconds,
+            run_id, stages
+        ))])
+
+class PostgresStorage(Storage):
+    """Neon PostgreSQL database"""
+
+    name = "postgres"
+    placeholder = '%s'
+
+    def __init__(self, database_url):
+        self.database_url = database_url
+
+    def connect(self):
+        import psycopg2
+        return psycopg2.connect(self.database_url)
+
+    def _is_partitioned(self, table):
+        df = self._read("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,))
+        return not df.empty
+
+    def _partitions(self, table):
+        """Monthly partitions of a table as {name: first day of the month}"""
+        df = self._read("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+        """, (table,))
+        partitions = {}
+        for name in df['relname']:
+            try:
+                partitions[name] = datetime.strptime(name, f"{table}_p%Y_%m")
+            except ValueError:
+                continue  # the default partition
+        return partitions
+
+    def ensure_partitions(self, months_ahead=2, now=None):
+        """
+        Create monthly partitions from the current month to `months_ahead` months
+        out. Rows already sitting in the default partition for a new month are
+        moved into it in the same transaction.
+        """
+        created = []
+        for table, date_column in PARTITIONED_TABLES.items():
+            if not self._is_partitioned(table):
+                continue
+            existing = self._partitions(table)
+            month = _month_start(now or datetime.now())
+            for _ in range(months_ahead + 1):
+                upper = _next_month(month)
+                name = partition_name(table, month)
+                if name not in existing:
+                    bounds = (month.strftime('%Y-%m-%d'), upper.strftime('%Y-%m-%d'))
+                    in_range = f"{date_column} >= %s AND {date_column} < %s"
+                    self._executemany([
+                        (f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)", None),
+                        (f"INSERT INTO {name} SELECT * FROM {table}_default WHERE {in_range}", bounds),
+                        (f"DELETE FROM {table}_default WHERE {in_range}", bounds),
+                        (f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds),
+                    ])
+                    created.append(name)
+                month = upper
+        return created
+
+    def expire_rows(self, table, before, archive_dir=None):
+        """
+        Drop whole monthly partitions older than `before`, then range-delete what is left.
+        A partition holding a model version's latest prediction batch is not dropped.
+        """
+        dropped = 0
+        if self._is_partitioned(table):
+            for name, month in sorted(self._partitions(table).items(), key=lambda item: item[1]):
+                if _next_month(month) > before:
+                    continue
+                if table == 'predictions':
+                    latest = self._read(f"SELECT COUNT(*) AS n FROM {name} WHERE NOT ({_before_latest_batch(name)})")
+                    if int(latest['n'].iloc[0]):
+                        # Holds a model version's latest batch: the range delete keeps it
+                        continue
+                if archive_dir:
+                    df = self._read(f"SELECT * FROM {name}")
+                    _archive(df, archive_dir, name)
+                    rows = len(df)
+                else:
+                    rows = int(self._read(f"SELECT COUNT(*) AS n FROM {name}")['n'].iloc[0])
+                self._executemany([(f"DROP TABLE {name}", None)])
+                print(f"   Dropped partition {name} ({rows} rows)")
+                dropped += rows
+        return dropped + super().expire_rows(table, before, archive_dir)
+
+class SQLiteStorage(Storage):
+    """Embedded SQLite database in WAL mode (readers never block the writer)"""
+
+    name = "sqlite"
+    placeholder = '?'
+
+    def __init__(self, path=SQLITE_DATABASE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self.connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SQLITE_SCHEMA)
+            # SQLite has no ADD COLUMN IF NOT EXISTS, so check existing columns first
+            for table, column, column_type in SQLITE_MIGRATIONS:
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys=ON")
+        # Safe with WAL: a crash can lose the last transaction but never corrupts the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _timestamp(self, value):
+        if isinstance(value, datetime):
+            return value.isoformat(sep=' ')
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+
+def get_storage():
+    """Primary storage: Postgres when DATABASE_URL is set, otherwise the local SQLite file"""
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        return PostgresStorage(database_url)
+    print(f"⚠️  DATABASE_URL not set. Using local SQLite database at {SQLITE_DATABASE_PATH}")
+    return SQLiteStorage(SQLITE_DATABASE_PATH)
+
+def get_replica():
+    """Local SQLite read replica (the primary itself when running offline)"""
+    return SQLiteStorage(SQLITE_DATABASE_PATH)
+
+def sync_replica(source, replica=None):
+    """Copy players and the latest predictions from the primary into the local replica"""
+    replica = replica or get_replica()
+    if isinstance(source, SQLiteStorage) and os.path.abspath(source.path) == os.path.abspath(replica.path):
+        return 0
+
+    players = source.load_players()
+    replica.upsert_players(players)
+    predictions = source.latest_predictions()
+    synced = replica.replace_latest_predictions(predictions)
+    print(f"✅ Synced {len(players)} players and {synced} predictions to local replica")
+    return synced
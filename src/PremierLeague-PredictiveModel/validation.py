@@ -0,0 +1,132 @@
+"""
+Data Quality Validation
+Vectorized checks run over the whole transformed player frame in one pass,
+between transform and load. Rows that fail any check are quarantined with
+the reasons instead of being silently dropped or loaded with bad values.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+ALLOWED_POSITIONS = ['GKP', 'DEF', 'MID', 'FWD']
+
+# FPL availability codes: available, doubtful, injured, not in squad, suspended, unavailable
+ALLOWED_STATUSES = ['a', 'd', 'i', 'n', 's', 'u', '']
+
+# Columns that must be present on every row
+REQUIRED_COLUMNS = ['player_id', 'name', 'team', 'position']
+
+# Inclusive (min, max) bounds; None means unbounded on that side
+VALUE_RANGES = {
+    'now_cost': (1, 300),
+    'selected_by_percent': (0, 100),
+    'minutes': (0, 38 * 120),
+    'starts': (0, 38),
+    'goals_scored': (0, None),
+    'assists': (0, None),
+    'clean_sheets': (0, 38),
+    'goals_conceded': (0, None),
+    'yellow_cards': (0, None),
+    'red_cards': (0, 38),
+    'saves': (0, None),
+    'bonus': (0, None),
+    'influence': (0, None),
+    'creativity': (0, None),
+    'threat': (0, None),
+    'ict_index': (0, None),
+    'expected_goals': (0, None),
+    'expected_assists': (0, None),
+    'expected_goal_involvements': (0, None),
+}
+
+def validate(df, raw=None):
+    """
+    Validate a transformed player frame.
+
+    raw: the frame before transform (optional). Values present in raw but
+    missing after numeric coercion are reported as invalid types.
+
+    Returns (valid, quarantined, report). quarantined has a 'reasons' column
+    listing every failed check, separated by semicolons.
+    """
+    start_time = time.perf_counter()
+    failures = {}
+
+    for col in REQUIRED_COLUMNS:
+        if col in df.columns:
+            missing = df[col].isna()
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                missing |= df[col].astype(str).str.strip() == ''
+            failures[f"missing_{col}"] = missing.to_numpy()
+
+    if 'player_id' in df.columns:
+        failures['duplicate_player_id'] = (
+            df['player_id'].duplicated(keep=False) & df['player_id'].notna()
+        ).to_numpy()
+
+    # Missing codes are covered by the required-column checks above
+    for col, allowed in [('position', ALLOWED_POSITIONS), ('status', ALLOWED_STATUSES)]:
+        if col in df.columns:
+            failures[f"invalid_{col}"] = (~(df[col].isin(allowed) | df[col].isna())).to_numpy()
+
+    numeric = df.select_dtypes(include='number')
+    if not numeric.empty:
+        # One pass over the numeric block for +/-inf in any column
+        values = numeric.to_numpy(dtype=float, na_value=np.nan)
+        non_finite = np.isinf(values)
+        for i, col in enumerate(numeric.columns):
+            if non_finite[:, i].any():
+                failures[f"non_finite_{col}"] = non_finite[:, i]
+
+    for col, (low, high) in VALUE_RANGES.items():
+        if col not in numeric.columns:
+            continue
+        values = numeric[col].to_numpy(dtype=float, na_value=np.nan)
+        out_of_range = np.zeros(len(df), dtype=bool)
+        if low is not None:
+            out_of_range |= values < low
+        if high is not None:
+            out_of_range |= values > high
+        # +/-inf is already reported as non-finite
+        out_of_range &= np.isfinite(values)
+        if out_of_range.any():
+            failures[f"out_of_range_{col}"] = out_of_range
+
+    if raw is not None:
+        raw = raw.rename(columns={'id': 'player_id'})
+        for col in numeric.columns:
+            if col not in raw.columns:
+                continue
+            raw_values = raw[col]
+            present = raw_values.notna()
+            if not pd.api.types.is_numeric_dtype(raw_values):
+                present &= raw_values.astype(str).str.strip() != ''
+            invalid_type = present.to_numpy() & df[col].isna().to_numpy()
+            if invalid_type.any():
+                failures[f"invalid_type_{col}"] = invalid_type
+
+    failed = np.zeros(len(df), dtype=bool)
+    for mask in failures.values():
+        failed |= mask
+
+    # Reason strings are only built for the (few) failing rows
+    reasons = pd.Series('', index=df.index[failed], dtype=object)
+    for check, mask in failures.items():
+        hits = mask[failed]
+        if hits.any():
+            reasons[hits] = reasons[hits] + check + ';'
+
+    quarantined = df[failed].copy()
+    quarantined['reasons'] = reasons.str.rstrip(';')
+    valid = df[~failed]
+
+    report = {
+        "rows": len(df),
+        "valid_rows": len(valid),
+        "quarantined_rows": len(quarantined),
+        "failed_checks": {check: int(mask.sum()) for check, mask in failures.items() if mask.any()},
+        "duration_ms": round((time.perf_counter() - start_time) * 1000, 3),
+    }
+    return valid, quarantined, report